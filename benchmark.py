@@ -0,0 +1,306 @@
+# Offline benchmark of the user and manager flows against local stand-ins for OpenAI and Google Sheets.
+#   $ python benchmark.py --sessions 20 --concurrency 4 --latency-ms 300 --output bench_results.json
+import argparse
+import json
+import os
+import random
+import resource
+import statistics
+import tempfile
+import threading
+import time
+import tracemalloc
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+# Build indexes in a throwaway directory so RAG timings are cold-start timings
+os.environ.setdefault("RAG_INDEX_CACHE_DIR", tempfile.mkdtemp(prefix="bench_rag_"))
+os.environ.setdefault("SHARD_SUMMARY_CACHE_DIR", tempfile.mkdtemp(prefix="bench_summary_"))
+os.environ.setdefault("OPENAI_API_KEY", "sk-local-benchmark")
+
+from functions import (
+    TOPIC_CORPORA,
+    TOPIC_INDEX_TYPES,
+    assess_question,
+    evaluate_all_responses,
+    evaluate_session,
+    evaluate_user_response,
+    generate_manager_summary_hierarchical,
+    get_questions_for_topic,
+    save_chat_to_gsheet,
+)
+from functions_gsheet import SHEET_COLUMNS, SheetMirror, SheetWriter, get_sheet_writer, set_sheet_writer
+from functions_jobs import submit_job
+from functions_metrics import percentile, stage_stats
+from functions_rag import RETRIEVAL_MODES, list_corpus_pdfs, load_or_build_bm25_index, load_or_build_corpus_index, rag_from_corpus
+
+SAMPLE_ANSWERS = [
+    "I would first check our internal policy and then ask the responsible team for advice.",
+    "We keep a checklist and review it every quarter with the whole department.",
+    "I am not sure, probably I would inform my manager and document what happened.",
+    "By limiting access to what people need and removing it when they leave the team.",
+]
+
+# --- Local OpenAI stand-in ---
+def make_fake_openai_handler(latency: float, token_latency: float, response_tokens: int):
+    class FakeOpenAIHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            model = body.get("model", "gpt-4o")
+            prompt_tokens = sum(len(str(m.get("content", "")).split()) for m in body.get("messages", []))
+            words = [f"word{i}" for i in range(response_tokens)]
+            time.sleep(latency)
+
+            if body.get("stream"):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.end_headers()
+                for word in words:
+                    time.sleep(token_latency)
+                    chunk = {
+                        "id": "chatcmpl-bench", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                        "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}],
+                    }
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                    self.wfile.flush()
+                self.wfile.write(b"data: [DONE]\n\n")
+                return
+
+            time.sleep(token_latency * response_tokens)
+            payload = json.dumps({
+                "id": "chatcmpl-bench", "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)}, "finish_reason": "stop"}],
+                "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": response_tokens, "total_tokens": prompt_tokens + response_tokens},
+            }).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            self.end_headers()
+            self.wfile.write(payload)
+
+    return FakeOpenAIHandler
+
+def start_fake_openai(latency: float, token_latency: float, response_tokens: int) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_fake_openai_handler(latency, token_latency, response_tokens))
+    threading.Thread(target=server.serve_forever, name="fake-openai", daemon=True).start()
+    return server
+
+# --- Local Google Sheets stand-in (the subset of gspread.Worksheet the app uses) ---
+class FakeWorksheet:
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.rows: List[List[str]] = []
+        self._lock = threading.Lock()
+
+    def row_values(self, row: int) -> List[str]:
+        time.sleep(self.latency)
+        with self._lock:
+            return list(self.rows[row - 1]) if len(self.rows) >= row else []
+
+    def append_rows(self, rows: List[List[str]], value_input_option: str = "RAW"):
+        time.sleep(self.latency)
+        with self._lock:
+            self.rows.extend(list(row) for row in rows)
+
+    def update_cell(self, row: int, col: int, value: str):
+        time.sleep(self.latency)
+        with self._lock:
+            while len(self.rows[row - 1]) < col:
+                self.rows[row - 1].append("")
+            self.rows[row - 1][col - 1] = value
+
+    def get(self, range_name: str) -> List[List[str]]:
+        # Only the "A<start>:<last column>" form used by SheetMirror.sync
+        time.sleep(self.latency)
+        start = int(range_name.split(":")[0][1:])
+        with self._lock:
+            return [list(row) for row in self.rows[start - 1:]]
+
+# --- Timing helpers ---
+class Timings:
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.samples[stage].append(seconds)
+
+    def summary(self) -> dict:
+        result = {}
+        for stage, values in sorted(self.samples.items()):
+            ordered = sorted(values)
+            result[stage] = {
+                "count": len(ordered),
+                "mean_ms": statistics.fmean(ordered) * 1000,
+                "p50_ms": percentile(ordered, 50) * 1000,
+                "p95_ms": percentile(ordered, 95) * 1000,
+                "p99_ms": percentile(ordered, 99) * 1000,
+                "max_ms": ordered[-1] * 1000,
+            }
+        return result
+
+# --- Flows, mirroring streamlit_app.py ---
+def run_user_session(topic: str, knowledge_type: str, timings: Timings, use_cache: bool, incremental: bool):
+    session_start = time.perf_counter()
+    qa_pairs = []
+    assessment_jobs = []
+    for question in get_questions_for_topic(topic, knowledge_type):
+        answer = random.choice(SAMPLE_ANSWERS)
+
+        # Attempt 1 is streamed into the chat bubble
+        start = time.perf_counter()
+        first_token = None
+        parts = []
+        for delta in evaluate_user_response(question, answer, topic, 1, stream=True, use_cache=use_cache):
+            if first_token is None:
+                first_token = time.perf_counter() - start
+            parts.append(delta)
+        timings.add("evaluate_user_response.attempt1.ttft", first_token or 0.0)
+        timings.add("evaluate_user_response.attempt1", time.perf_counter() - start)
+        qa_pairs.append((question, answer))
+
+        # Attempt 2 does not block the chat: in incremental mode it is a background assessment
+        start = time.perf_counter()
+        if incremental:
+            assessment_jobs.append(submit_job(assess_question, question, answer, "".join(parts), answer, topic, use_cache=use_cache))
+        else:
+            evaluate_user_response(question, answer, topic, 2, use_cache=use_cache)
+        timings.add("evaluate_user_response.attempt2", time.perf_counter() - start)
+        qa_pairs.append((f"Follow-up on: {question}", answer))
+
+    start = time.perf_counter()
+    first_token = None
+    if incremental:
+        final = evaluate_session(qa_pairs, topic, assessment_jobs, stream=True)
+    else:
+        final = evaluate_all_responses(qa_pairs, topic, stream=True, use_cache=use_cache)
+    for _ in final:
+        if first_token is None:
+            first_token = time.perf_counter() - start
+    timings.add("evaluate_all_responses.ttft", first_token or 0.0)
+    timings.add("evaluate_all_responses", time.perf_counter() - start)
+
+    start = time.perf_counter()
+    save_chat_to_gsheet(topic=topic, chat_text="\n".join(f"Q: {q} A: {a}" for q, a in qa_pairs))
+    timings.add("save_chat_to_gsheet", time.perf_counter() - start)
+    timings.add("user_session", time.perf_counter() - session_start)
+
+def run_manager_flow(mirror: SheetMirror, timings: Timings):
+    start = time.perf_counter()
+    mirror.sync()
+    timings.add("manager.mirror_sync", time.perf_counter() - start)
+
+    start = time.perf_counter()
+    topics = mirror.topics()
+    timings.add("manager.topics", time.perf_counter() - start)
+    for topic in topics:
+        start = time.perf_counter()
+        chats = mirror.topic_chats(topic)
+        timings.add("manager.topic_chats", time.perf_counter() - start)
+
+        start = time.perf_counter()
+        generate_manager_summary_hierarchical(topic, chats)
+        timings.add("manager.summary", time.perf_counter() - start)
+
+def run_rag_benchmark(timings: Timings, queries: int, mode: str = "dense") -> dict:
+    results = {}
+    for topic, sources in TOPIC_CORPORA.items():
+        if not list_corpus_pdfs(sources):
+            results[topic] = "skipped: no PDFs"
+            continue
+        index_type = TOPIC_INDEX_TYPES.get(topic, "auto")
+        start = time.perf_counter()
+        if mode == "bm25":
+            index, chunks = load_or_build_bm25_index(sources)
+            size = len(index.doc_lengths)
+        else:
+            index, chunks = load_or_build_corpus_index(sources, index_type=index_type)
+            size = index.ntotal
+            if mode == "hybrid":
+                load_or_build_bm25_index(sources)
+        timings.add("rag.build", time.perf_counter() - start)
+        questions = get_questions_for_topic(topic, "My knowledge on the topic")
+        for i in range(queries):
+            start = time.perf_counter()
+            rag_from_corpus(sources, questions[i % len(questions)], k=3, index_type=index_type, mode=mode)
+            timings.add("rag.query", time.perf_counter() - start)
+        results[topic] = {"chunks": len(chunks), "vectors": size, "mode": mode}
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the knowledge checker flows offline.")
+    parser.add_argument("--sessions", type=int, default=10, help="number of simulated user sessions")
+    parser.add_argument("--concurrency", type=int, default=4, help="sessions running at the same time")
+    parser.add_argument("--topics", nargs="+", default=["GDPR", "Cybersecurity", "EU AI Act", "Maatschappelijke agenda 2023-2027"])
+    parser.add_argument("--latency-ms", type=float, default=300, help="fake OpenAI latency before the first token")
+    parser.add_argument("--token-latency-ms", type=float, default=5, help="fake OpenAI latency per generated token")
+    parser.add_argument("--response-tokens", type=int, default=60)
+    parser.add_argument("--sheet-latency-ms", type=float, default=200, help="fake Google Sheets latency per call")
+    parser.add_argument("--rag-queries", type=int, default=20, help="retrieval queries per grounded topic")
+    parser.add_argument("--retrieval-mode", choices=RETRIEVAL_MODES, default="dense", help="retriever used for the RAG timings")
+    parser.add_argument("--use-cache", action="store_true", help="allow LLM response cache hits")
+    parser.add_argument("--full-final", action="store_true", help="final evaluation on the full transcript instead of per-question notes")
+    parser.add_argument("--output", default="bench_results.json")
+    args = parser.parse_args()
+
+    server = start_fake_openai(args.latency_ms / 1000, args.token_latency_ms / 1000, args.response_tokens)
+    # Read by the shared OpenAI client when it is first created
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}/v1/"
+    worksheet = FakeWorksheet(args.sheet_latency_ms / 1000)
+    set_sheet_writer(SheetWriter(opener=lambda name: worksheet, flush_interval=1.0))
+
+    timings = Timings()
+    tracemalloc.start()
+    started = time.perf_counter()
+
+    rag = run_rag_benchmark(timings, args.rag_queries, args.retrieval_mode)
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        futures = [
+            pool.submit(run_user_session, args.topics[i % len(args.topics)], "My knowledge on the topic", timings, args.use_cache, not args.full_final)
+            for i in range(args.sessions)
+        ]
+        for future in futures:
+            future.result()
+
+    start = time.perf_counter()
+    get_sheet_writer().flush()
+    timings.add("gsheet.flush", time.perf_counter() - start)
+
+    mirror = SheetMirror(os.path.join(tempfile.mkdtemp(prefix="bench_mirror_"), "mirror.sqlite"), opener=lambda name: worksheet)
+    run_manager_flow(mirror, timings)
+
+    _, peak_traced = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    server.shutdown()
+
+    results = {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": vars(args),
+        "wall_time_s": time.perf_counter() - started,
+        "rows_written": len(worksheet.rows) - 1 if worksheet.rows and worksheet.rows[0] == SHEET_COLUMNS else len(worksheet.rows),
+        "rag": rag,
+        "stages": timings.summary(),
+        # Internal spans recorded by the app code itself (PDF, embed, retrieve, prompt, OpenAI, sheet)
+        "spans": stage_stats(),
+        "memory": {
+            "peak_python_alloc_mb": peak_traced / 1e6,
+            # ru_maxrss is in KiB on Linux
+            "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+        },
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+    for stage, stats in results["stages"].items():
+        print(f"{stage:45s} n={stats['count']:4d}  p50={stats['p50_ms']:8.1f}ms  p95={stats['p95_ms']:8.1f}ms  p99={stats['p99_ms']:8.1f}ms")
+    print(f"Results written to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+# Checks that a faster embedding backend retrieves the same chunks as the reference torch backend.
+#   $ python check_embeddings.py --candidate onnx-int8 --threshold 0.9
+import argparse
+import sys
+
+from functions import TOPIC_CORPORA, get_questions_for_topic
+from functions_rag import backend_topk_overlap, extract_pdf_chunks, list_corpus_pdfs
+
+KNOWLEDGE_TYPES = ["My knowledge on the topic", "My department’s maturity on the topic"]
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare top-k retrieval between embedding backends.")
+    parser.add_argument("--reference", default="torch")
+    parser.add_argument("--candidate", default="onnx-int8")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--threshold", type=float, default=0.9, help="minimum mean top-k overlap per topic")
+    args = parser.parse_args()
+
+    failed = False
+    for topic, sources in TOPIC_CORPORA.items():
+        pdf_paths = list_corpus_pdfs(sources)
+        if not pdf_paths:
+            continue
+        chunks = [chunk for pdf_path in pdf_paths for chunk in extract_pdf_chunks(pdf_path)]
+        queries = list(dict.fromkeys(q for kt in KNOWLEDGE_TYPES for q in get_questions_for_topic(topic, kt)))
+        overlap = backend_topk_overlap(chunks, queries, args.k, reference=args.reference, candidate=args.candidate)
+        status = "OK" if overlap >= args.threshold else "BELOW THRESHOLD"
+        failed = failed or overlap < args.threshold
+        print(f"{topic}: top-{args.k} overlap {overlap:.2%} ({status})")
+
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,171 @@
 import streamlit as st
-import openai
-from streamlit_gsheets import GSheetsConnection
-import pandas as pd
+import hashlib
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from typing import Iterator, List, Union
+from functions_cache import get_llm_cache, make_cache_key
+from functions_gsheet import get_sheet_writer
+from functions_jobs import wait_for_job
+from functions_metrics import record_span, span
+from functions_openai import get_pooled_client
+from functions_questions import get_question_entries
+from functions_tokens import ANSWER_TOKEN_BUDGET, CONTEXT_TOKEN_BUDGET, budget_chunks, count_tokens, trim_to_tokens
 from functions_rag import (
     extract_pdf_chunks,
     embed_chunks,
     create_faiss_index,
     retrieve_relevant_chunks,
     rag_from_pdf,
+    rag_from_corpus,
+    list_corpus_pdfs,
+    lookup_precomputed_chunks,
+    warm_up_rag,
 )
 
+# Topics grounded in source documents: each entry lists PDFs and/or directories of PDFs.
+# Drop a PDF into a topic directory to add it; only that file gets embedded on the next build.
+TOPIC_CORPORA = {
+    "Maatschappelijke agenda 2023-2027": ["dutch_policy.pdf", "corpora/maatschappelijke_agenda"],
+    "GDPR": ["corpora/gdpr"],
+    "Cybersecurity": ["corpora/cybersecurity"],
+    "EU AI Act": ["corpora/eu_ai_act"],
+}
+# FAISS index per topic: "flat", "ivf", "hnsw" or "auto" (approximate once a corpus is large)
+TOPIC_INDEX_TYPES = {}
+# Retrieval per topic: "dense" (FAISS), "bm25" (keywords, no embedding model) or "hybrid" (both fused).
+# RAG_RETRIEVAL_MODE sets the default, e.g. "bm25" on small CPU-only replicas.
+DEFAULT_RETRIEVAL_MODE = os.environ.get("RAG_RETRIEVAL_MODE", "dense")
+TOPIC_RETRIEVAL_MODES = {}
+
+def topic_retrieval_mode(topic: str) -> str:
+    return TOPIC_RETRIEVAL_MODES.get(topic, DEFAULT_RETRIEVAL_MODE)
+
+# --- Warm up the embedding model and topic indexes in the background ---
+def warm_up_rag_topics():
+    if os.environ.get("RAG_WARM_UP", "1") == "0":
+        return
+    warm_up_rag([
+        (sources, TOPIC_INDEX_TYPES.get(topic, "auto"), topic_retrieval_mode(topic))
+        for topic, sources in TOPIC_CORPORA.items()
+    ])
+
 # --- Initialize OpenAI client ---
+# Optional keys in the [openai] secrets section that tune the shared client; OPENAI_<KEY> environment
+# variables (e.g. OPENAI_MAX_CONCURRENCY) override them, so scripts can tune it too
+CLIENT_SETTINGS = ("base_url", "timeout", "max_concurrency", "requests_per_minute", "tokens_per_minute", "max_retries")
+
+def _env_client_settings() -> dict:
+    settings = {}
+    for key in CLIENT_SETTINGS:
+        value = os.environ.get(f"OPENAI_{key.upper()}")
+        if value:
+            settings[key] = value if key == "base_url" else float(value) if key == "timeout" else int(value)
+    return settings
+
 def get_client():
     try:
-        openai.api_key = st.secrets["openai"]["api_key"]
-        return openai
+        secrets = st.secrets["openai"]
+        api_key = secrets["api_key"]
+        settings = {key: secrets[key] for key in CLIENT_SETTINGS if key in secrets}
     except Exception:
-        st.error("OpenAI API key not found.")
-        return None
+        # Outside Streamlit (benchmarks, scripts) fall back to the standard environment variable
+        api_key = os.environ.get("OPENAI_API_KEY")
+        settings = {}
+        if not api_key:
+            st.error("OpenAI API key not found.")
+            return None
+    settings.update(_env_client_settings())
+    return get_pooled_client(api_key, **settings)
+
+# Bump when any prompt template changes, so cached completions from the old wording are not reused
+PROMPT_TEMPLATE_VERSION = "2"
+
+# --- Run a chat completion, optionally streaming the text deltas ---
+def _usage_info(usage) -> dict:
+    # cached_tokens: how much of the prompt was served from the provider's prompt cache (0 below 1024 prompt tokens)
+    details = getattr(usage, "prompt_tokens_details", None)
+    return {
+        "prompt_tokens": usage.prompt_tokens,
+        "completion_tokens": usage.completion_tokens,
+        "cached_tokens": getattr(details, "cached_tokens", 0) or 0,
+    }
+
+def _stream_deltas(client, messages: list, model: str, error_prefix: str, cache_key: str = None, stage: str = "openai.chat") -> Iterator[str]:
+    parts = []
+    usage = None
+    start = time.perf_counter()
+    info = {"model": model, "stream": True}
+    try:
+        stream = client.stream_chat_completion(
+            model=model,
+            messages=messages,
+            temperature=0.3,
+            stream_options={"include_usage": True},
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                if not parts:
+                    info["ttft_ms"] = round((time.perf_counter() - start) * 1000, 2)
+                parts.append(chunk.choices[0].delta.content)
+                yield chunk.choices[0].delta.content
+            if getattr(chunk, "usage", None):
+                usage = chunk.usage
+    except Exception as e:
+        record_span(stage, time.perf_counter() - start, error=str(e), **info)
+        yield f"{error_prefix}: {e}"
+        return
+    if usage:
+        info.update(_usage_info(usage))
+    record_span(stage, time.perf_counter() - start, **info)
+    if cache_key:
+        get_llm_cache().set(cache_key, "".join(parts).strip())
+
+def _complete(system: str, prompt: str, model: str, error_prefix: str, stream: bool = False, use_cache: bool = True, stage: str = "openai.chat") -> Union[str, Iterator[str]]:
+    messages = [
+        {"role": "system", "content": system},
+        {"role": "user", "content": prompt}
+    ]
+
+    cache_key = None
+    if use_cache:
+        cache_key = make_cache_key(model, messages, 0.3, PROMPT_TEMPLATE_VERSION)
+        cached = get_llm_cache().get(cache_key)
+        if cached is not None:
+            return iter([cached]) if stream else cached
+
+    client = get_client()
+    if not client:
+        return iter(["Error: No OpenAI client."]) if stream else "Error: No OpenAI client."
+
+    if stream:
+        return _stream_deltas(client, messages, model, error_prefix, cache_key, stage)
+
+    with span(stage, model=model, stream=False) as info:
+        try:
+            completion = client.chat_completion(
+                model=model,
+                messages=messages,
+                temperature=0.3,
+            )
+            text = completion.choices[0].message.content.strip()
+        except Exception as e:
+            info["error"] = str(e)
+            return f"{error_prefix}: {e}"
+        if completion.usage:
+            info.update(_usage_info(completion.usage))
+    if cache_key:
+        get_llm_cache().set(cache_key, text)
+    return text
 
 # --- Build evaluation prompt with bot rules ---
-def get_evaluation_prompt(question: str, answer: str, topic: str, attempts: int) -> str:
-    text_top_chunks=" "
-    if topic=="Maatschappelijke agenda 2023-2027":
-        pdf_path = "dutch_policy.pdf"
-        top_chunks = rag_from_pdf(pdf_path, question, k=3)
-        text_top_chunks=f"Assess the user answer and/or elaborate the follow-up question (if needed) based on this information: {top_chunks}"
-    else:
-        text_top_chunks=" "
-    final_text = f"""
-You are a knowledge assessment evaluator for employee training on the topic of {topic}.
+# The rules come first and never change, and everything request-specific follows. This prefix is
+# ~300 tokens, below OpenAI's 1024-token minimum for prompt caching, so it gets no cache hits as is
+EVALUATION_RULES = """
+You are a knowledge assessment evaluator for employee training. The training topic, the current attempt, the question and the user's answer are given below the rules.
 
 Follow these instructions carefully:
 
@@ -39,53 +175,98 @@ Follow these instructions carefully:
 4. If the user tries to ask something unrelated, reply: My goal is to check your knowledge. Let's complete the assessment first. However if the user asks for examples or more information, please provide it.
 5. If the answer is satisfactory, the follow-up question is not needed.
 6. Be nice and add complements to the follow-up question whenever suitable.
-{text_top_chunks}
+7. If reference information is given, assess the user answer and/or elaborate the follow-up question (if needed) based on it.
 
 Stay professional and constructive in your tone.
+""".strip()
 
-Current Attempt: {attempts}/2
+def get_evaluation_prompt(question: str, answer: str, topic: str, attempts: int, model: str = "gpt-4o") -> str:
+    top_chunks = []
+    if topic in TOPIC_CORPORA and list_corpus_pdfs(TOPIC_CORPORA[topic]):
+        sources = TOPIC_CORPORA[topic]
+        index_type = TOPIC_INDEX_TYPES.get(topic, "auto")
+        mode = topic_retrieval_mode(topic)
+        with span("rag.context", topic=topic, mode=mode) as info:
+            # Built-in questions use the precomputed table; custom questions fall back to live retrieval
+            top_chunks = lookup_precomputed_chunks(topic, question, sources, k=3, index_type=index_type, mode=mode)
+            info["precomputed"] = top_chunks is not None
+            if top_chunks is None:
+                top_chunks = rag_from_corpus(sources, question, k=3, index_type=index_type, mode=mode)
+
+    start = time.perf_counter()
+    sections = [EVALUATION_RULES, "---", f"Topic: {topic}"]
+    chunks = budget_chunks(top_chunks, CONTEXT_TOKEN_BUDGET, model)
+    if chunks:
+        sections.append("Reference information:\n" + "\n".join(f"- {chunk}" for chunk in chunks))
+    sections += [
+        f"Current Attempt: {attempts}/2",
+        f"Question: {question}",
+        f"User Answer: {trim_to_tokens(answer, ANSWER_TOKEN_BUDGET, model)}",
+        "Now respond according to the rules above.",
+    ]
+    final_text = "\n\n".join(sections)
+    record_span("prompt.build", time.perf_counter() - start, topic=topic, prompt_tokens=count_tokens(final_text, model), context_chunks=len(chunks))
+    return final_text
 
----
+# --- Evaluate response using OpenAI ---
+# With stream=True, returns an iterator of text deltas instead of the full text; the app runs it as a
+# background job (functions_jobs) and its polling fragment shows the text collected so far
+def evaluate_user_response(question: str, answer: str, topic: str, attempts: int, model: str = "gpt-4o", stream: bool = False, use_cache: bool = True) -> Union[str, Iterator[str]]:
+    prompt = get_evaluation_prompt(question, answer, topic, attempts, model)
+    return _complete("You are a knowledge assessment evaluator.", prompt, model, "Error evaluating response", stream, use_cache, "openai.evaluate_user_response")
 
-Question: {question}
+# --- Final overall evaluation after all Q&A ---
+def evaluate_all_responses(qa_pairs: list, topic: str, model: str = "gpt-4o", stream: bool = False, use_cache: bool = True) -> Union[str, Iterator[str]]:
+    formatted = "\n\n".join([f"Q: {q}\nA: {a}" for q, a in qa_pairs])
+    prompt = f"""
+You are a knowledge assessment evaluator for employee training on the topic of {topic}.
 
-User Answer: {answer}
+Here is a complete set of questions and user answers:
 
-Now respond according to the rules above."""
-    return final_text.strip()
+{formatted}
 
-# --- Evaluate response using OpenAI ---
-def evaluate_user_response(question: str, answer: str, topic: str, attempts: int, model: str = "gpt-4o") -> str:
-    client = get_client()
-    if not client:
-        return "Error: No OpenAI client."
+Now provide a structured final evaluation that includes:
+✅ Strengths  
+⚠️ Areas to Improve  
+💡 Suggestions  
+⭐ Overall Rating (Needs Improvement / Good / Excellent)
 
-    prompt = get_evaluation_prompt(question, answer, topic, attempts)
+Be concise, professional, and helpful.
+""".strip()
 
-    try:
-        completion = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You are a knowledge assessment evaluator."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-        )
-        return completion.choices[0].message.content.strip()
-    except Exception as e:
-        return f"Error evaluating response: {e}"
+    return _complete("You are a final assessment evaluator.", prompt, model, "Error generating final summary", stream, use_cache, "openai.evaluate_all_responses")
 
-# --- Final overall evaluation after all Q&A ---
-def evaluate_all_responses(qa_pairs: list, topic: str, model: str = "gpt-4o") -> str:
-    client = get_client()
-    if not client:
-        return "Error: No OpenAI client."
+# --- Incremental mode: assess each question as soon as its two attempts are in ---
+# The final evaluation then only merges these short notes instead of the full transcript
+INCREMENTAL_EVALUATION = os.environ.get("INCREMENTAL_EVALUATION", "1") == "1"
 
-    formatted = "\n\n".join([f"Q: {q}\nA: {a}" for q, a in qa_pairs])
+def assess_question(question: str, answer: str, followup: str, followup_answer: str, topic: str, model: str = "gpt-4o", use_cache: bool = True) -> str:
     prompt = f"""
 You are a knowledge assessment evaluator for employee training on the topic of {topic}.
 
-Here is a complete set of questions and user answers:
+Assess this single question. Reply with JSON only, in this exact shape:
+{{"strengths": "<one short sentence>", "gaps": "<one short sentence>", "score": <1-5>}}
+
+Question: {question}
+User Answer: {answer}
+Follow-up: {followup}
+User Answer: {followup_answer}
+""".strip()
+
+    text = _complete("You are a knowledge assessment evaluator.", prompt, model, "Error assessing question", use_cache=use_cache, stage="openai.assess_question")
+    try:
+        assessment = json.loads(text.strip().removeprefix("```json").removeprefix("```").removesuffix("```"))
+        return f"Strengths: {assessment['strengths']} | Gaps: {assessment['gaps']} | Score: {assessment['score']}/5"
+    except (ValueError, KeyError, TypeError):
+        # Not valid JSON: keep the raw notes, they are still short
+        return text
+
+def evaluate_all_responses_incremental(questions: List[str], assessments: List[str], topic: str, model: str = "gpt-4o", stream: bool = False, use_cache: bool = True) -> Union[str, Iterator[str]]:
+    formatted = "\n".join(f"{i + 1}. {q}\n   {a}" for i, (q, a) in enumerate(zip(questions, assessments)))
+    prompt = f"""
+You are a knowledge assessment evaluator for employee training on the topic of {topic}.
+
+Here are short assessments of each question the user answered:
 
 {formatted}
 
@@ -98,25 +279,25 @@ Now provide a structured final evaluation that includes:
 Be concise, professional, and helpful.
 """.strip()
 
-    try:
-        completion = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You are a final assessment evaluator."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-        )
-        return completion.choices[0].message.content.strip()
-    except Exception as e:
-        return f"Error generating final summary: {e}"
+    return _complete("You are a final assessment evaluator.", prompt, model, "Error generating final summary", stream, use_cache, "openai.evaluate_all_responses")
 
-# --- Generate manager-level team summary ---
-def generate_manager_summary(topic: str, combined_chats: str, model: str = "gpt-4o") -> str:
-    client = get_client()
-    if not client:
-        return "Error: No OpenAI client."
+def evaluate_session(qa_pairs: list, topic: str, assessment_job_ids: List[str], model: str = "gpt-4o", stream: bool = False) -> Union[str, Iterator[str]]:
+    # Runs as a background job: waits for the per-question assessments, then merges them.
+    # Falls back to the full transcript if any assessment is missing or failed.
+    assessments = []
+    for job_id in assessment_job_ids:
+        job = wait_for_job(job_id)
+        if job is None or job.error or job.text.startswith("Error"):
+            return evaluate_all_responses(qa_pairs, topic, model, stream)
+        assessments.append(job.text)
+
+    questions = [q for q, _ in qa_pairs[::2]]
+    if not assessments or len(assessments) != len(questions):
+        return evaluate_all_responses(qa_pairs, topic, model, stream)
+    return evaluate_all_responses_incremental(questions, assessments, topic, model, stream)
 
+# --- Generate manager-level team summary ---
+def generate_manager_summary(topic: str, combined_chats: str, model: str = "gpt-4o", use_cache: bool = True) -> str:
     prompt = f"""
 You are a team performance evaluator.
 
@@ -136,131 +317,79 @@ Collected Team Responses:
 {combined_chats}
 """.strip()
 
-    try:
-        completion = client.chat.completions.create(
-            model=model,
-            messages=[
-                {"role": "system", "content": "You are a team assessment summarizer."},
-                {"role": "user", "content": prompt}
-            ],
-            temperature=0.3,
-        )
-        return completion.choices[0].message.content.strip()
-    except Exception as e:
-        return f"Error generating manager summary: {e}"
+    return _complete("You are a team assessment summarizer.", prompt, model, "Error generating manager summary", use_cache=use_cache, stage="openai.generate_manager_summary")
 
-# --- Save chat to Google Sheets ---
-def save_chat_to_gsheet(topic: str, chat_text: str):
+# --- Map-reduce manager summary for topics with many sessions ---
+SHARD_SUMMARY_CACHE_DIR = os.environ.get("SHARD_SUMMARY_CACHE_DIR", ".summary_cache")
+
+def _shard_cache_path(topic: str, chats: List[str], model: str) -> str:
+    sha = hashlib.sha256(f"{topic}|{model}".encode("utf-8"))
+    for chat in chats:
+        sha.update(hashlib.sha256(chat.encode("utf-8")).digest())
+    return os.path.join(SHARD_SUMMARY_CACHE_DIR, f"{sha.hexdigest()[:32]}.json")
+
+def summarize_chat_shard(topic: str, chats: List[str], model: str = "gpt-4o") -> str:
+    cache_path = _shard_cache_path(topic, chats, model)
     try:
-        conn = st.connection("gsheets", type=GSheetsConnection)
-        df = conn.read(worksheet="Sheet1", ttl=0)
+        with open(cache_path, encoding="utf-8") as f:
+            return json.load(f)["summary"]
+    except (OSError, ValueError, KeyError, TypeError):
+        # Missing or unreadable (e.g. left by an older crashed write): summarize again and overwrite it
+        pass
+
+    combined = "\n\n".join(chats)
+    prompt = f"""
+You are a team performance evaluator.
+
+Below is one batch of collected responses on the topic of {topic}. Write compact notes that will later be merged with notes from other batches.
+
+List:
+- Strengths shown
+- Common gaps or misconceptions
+- How many sessions showed each point (roughly)
+
+Do **not** mention individual users or quote answers. Keep it under 200 words.
+
+---
+
+Collected Team Responses:
+{combined}
+""".strip()
+    summary = _complete("You are a team assessment summarizer.", prompt, model, "Error generating manager summary", stage="openai.summarize_chat_shard")
+
+    if not summary.startswith("Error"):
+        os.makedirs(SHARD_SUMMARY_CACHE_DIR, exist_ok=True)
+        # Write to a temp file and rename, so a concurrent reader never sees a half-written file
+        tmp_path = f"{cache_path}.tmp{os.getpid()}.{threading.get_ident()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"topic": topic, "rows": len(chats), "summary": summary}, f, ensure_ascii=False)
+        os.replace(tmp_path, cache_path)
+    return summary
+
+def generate_manager_summary_hierarchical(topic: str, chats: List[str], shard_size: int = 20, max_workers: int = 4, model: str = "gpt-4o", use_cache: bool = True) -> str:
+    if len(chats) <= shard_size:
+        return generate_manager_summary(topic, "\n\n".join(chats), model, use_cache)
 
-        if df is None or df.empty:
-            # Create new dataframe if sheet is empty
-            updated_df = pd.DataFrame([{"topic": topic, "chat": chat_text}])
-        else:
-            # Append new row using concat
-            new_row = pd.DataFrame([{"topic": topic, "chat": chat_text}])
-            updated_df = pd.concat([df, new_row], ignore_index=True)
+    # Fixed-size shards in sheet order: new sessions only change the last shard(s), the rest hit the cache
+    shards = [chats[i:i + shard_size] for i in range(0, len(chats), shard_size)]
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        shard_summaries = list(pool.map(lambda shard: summarize_chat_shard(topic, shard, model), shards))
 
-        # Write back to sheet
-        conn.update(worksheet="Sheet1", data=updated_df)
-        #st.success("Chat saved to Google Sheets!")
+    failed = [summary for summary in shard_summaries if summary.startswith("Error")]
+    if failed:
+        return failed[0]
 
+    combined = "\n\n".join(f"Batch {i + 1} notes:\n{summary}" for i, summary in enumerate(shard_summaries))
+    return generate_manager_summary(topic, combined, model, use_cache)
+
+# --- Save chat to Google Sheets ---
+# Rows are queued and appended in batches by a background writer, so the caller never waits on the sheet
+def save_chat_to_gsheet(topic: str, chat_text: str):
+    try:
+        get_sheet_writer().enqueue([topic, chat_text, datetime.now(timezone.utc).isoformat(timespec="seconds")])
     except Exception as e:
         st.error(f"Error saving to Google Sheets: {e}")
 
-# --- Return 3 questions per topic ---
+# --- Return the questions for a topic, from the question bank (question_bank.json) ---
 def get_questions_for_topic(topic: str, knowledge_type:str) -> list:
-    if knowledge_type=="My knowledge about the topic":
-        if topic == "Other":
-            return ["What topic do you want to evaluate your knowledge of?"]
-    
-        default=[
-            f"Imagine you're onboarding a new colleague. How would you explain why {topic} matters in their daily work?",
-            f"You face a challenge involving {topic}. What's your first step to deal with it confidently?",
-            f"What is one habit or checklist that could help your team avoid mistakes related to {topic}?",
-            f"When has {topic} positively impacted your work — even if indirectly?",
-            f"What tools or support would make you feel more confident handling situations involving {topic}?"]
-
-        return {
-            
-                "GDPR": [
-                    "A customer requests deletion of all their personal data. What steps would you take — and how do you ensure it's done legally?",
-                    "You're preparing a presentation with real customer examples. How do you make sure you're GDPR-compliant?",
-                    "What’s a practical way to double-check you're not sharing personal data by mistake in everyday emails or files?",
-                    "Your colleague wants to store employee birthdays in a shared file. How would you handle this under GDPR?",
-                    "What's one habit you could adopt to help prevent personal data breaches in your work?"
-                ],
-                "Cybersecurity": [
-                    "You receive a slightly suspicious email from a colleague asking for a file. What signs would help you decide if it’s safe?",
-                    "You're working in a co-working space. What can you do to protect your screen and data?",
-                    "What’s a small step your team could take this week to boost cybersecurity awareness?",
-                    "You accidentally clicked on a suspicious link. What should you do immediately — and who should you inform?",
-                    "What’s one tool or feature (e.g., VPN, password manager) that you think more people in your team should be using?"
-                ],
-                "EU AI Act": [
-                    "Your team wants to use AI to screen job applications. What would you check to ensure compliance with the EU AI Act?",
-                    "How would you explain to a colleague why AI transparency and accountability matter under the new regulation?",
-                    "What practical steps can an organization take to identify if an AI tool falls into the 'high-risk' category?",
-                    "You’re reviewing an AI tool for use in a safety-critical area. What red flags would you look for?",
-                    "What kind of documentation or testing would help you trust an AI system more in your work?"
-                ],
-                "Maatschappelijke agenda 2023-2027": [
-                    "Your project may influence one of the goals in the Maatschappelijke agenda. How can you align your work with it?",
-                    "What is one concrete action employees can take to support the social themes in the agenda?",
-                    "If your team had to pick one societal challenge to address this year, which one would it be — and why?",
-                    "How do you think the agenda’s goals could change how we prioritize our projects in the future?",
-                    "What kind of collaboration across teams would help advance the objectives of the agenda?"]}.get(topic, default)
-
-
-
-
-        
-
-    else:
-        if topic == "Other":
-            return ["What topic do you want to evaluate your knowledge of?"]
-    
-        default=[
-            f"Imagine you're onboarding a new colleague. How would you explain why {topic} matters in their daily work?",
-            f"You face a challenge involving {topic}. What's your first step to deal with it confidently?",
-            f"What is one habit or checklist that could help your team avoid mistakes related to {topic}?",
-            f"When has {topic} positively impacted your work — even if indirectly?",
-            f"What tools or support would make you feel more confident handling situations involving {topic}?"]
-    
-        return {
-    
-        "GDPR": [
-            "A customer requests deletion of all their personal data. What steps would you take — and how do you ensure it's done legally?",
-            "You're preparing a presentation with real customer examples. How do you make sure you're GDPR-compliant?",
-            "What’s a practical way to double-check you're not sharing personal data by mistake in everyday emails or files?",
-            "Your colleague wants to store employee birthdays in a shared file. How would you handle this under GDPR?",
-            "What's one habit you could adopt to help prevent personal data breaches in your work?"
-        ],
-        "Cybersecurity": [
-            "If a cybersecurity incident (e.g., phishing attack, data breach) occurred today, what steps would be followed? Is there a documented process everyone knows about?",
-                "How is access to systems and data managed — and how often is it reviewed or updated?",
-                "When someone joins or leaves the team, what steps are taken to grant or revoke access to tools and sensitive information?",
-                "What ensures that everyone stays up to date on cybersecurity best practices? Is there any regular training or simulation?",
-                "Are there clear guidelines on which tools (e.g., file sharing platforms, communication apps) are approved for secure work? How are these communicated?",
-                "How is sensitive information like contracts or personal data stored? Is encryption or secure storage part of the routine?",
-                "When working with external vendors or freelancers, what cybersecurity requirements or checks are in place?",
-                "Do people know where to find cybersecurity policies — and are these reviewed or discussed regularly?",
-                "How is the use of personal or unofficial tools (like personal Dropbox or WhatsApp) monitored or discouraged?",
-                "Have cybersecurity processes ever been formally reviewed? If so, what improvements came from that review?"
-        ],
-        "EU AI Act": [
-            "Your team wants to use AI to screen job applications. What would you check to ensure compliance with the EU AI Act?",
-            "How would you explain to a colleague why AI transparency and accountability matter under the new regulation?",
-            "What practical steps can an organization take to identify if an AI tool falls into the 'high-risk' category?",
-            "You’re reviewing an AI tool for use in a safety-critical area. What red flags would you look for?",
-            "What kind of documentation or testing would help you trust an AI system more in your work?"
-        ],
-        "Maatschappelijke agenda 2023-2027": [
-            "Your project may influence one of the goals in the Maatschappelijke agenda. How can you align your work with it?",
-            "What is one concrete action employees can take to support the social themes in the agenda?",
-            "If your team had to pick one societal challenge to address this year, which one would it be — and why?",
-            "How do you think the agenda’s goals could change how we prioritize our projects in the future?",
-            "What kind of collaboration across teams would help advance the objectives of the agenda?"]}.get(topic, default)
-
+    return [question.text for question in get_question_entries(topic, knowledge_type)]
@@ -0,0 +1,60 @@
+import heapq
+import math
+import re
+from collections import Counter, defaultdict
+from typing import Dict, List, Sequence, Tuple
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in _TOKEN_RE.findall(text.lower()) if len(token) > 1]
+
+# --- Okapi BM25 over a precomputed inverted index ---
+class BM25Index:
+    def __init__(self, postings: Dict[str, List[Tuple[int, int]]], doc_lengths: List[int], k1: float = 1.5, b: float = 0.75):
+        self.postings = postings
+        self.doc_lengths = doc_lengths
+        self.k1 = k1
+        self.b = b
+        self.avg_length = (sum(doc_lengths) / len(doc_lengths)) if doc_lengths else 0.0
+        n = len(doc_lengths)
+        self.idf = {term: math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5)) for term, docs in postings.items()}
+
+    @classmethod
+    def build(cls, chunks: Sequence[str], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        postings: Dict[str, List[Tuple[int, int]]] = defaultdict(list)
+        doc_lengths = []
+        for doc_id, chunk in enumerate(chunks):
+            counts = Counter(tokenize(chunk))
+            doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                postings[term].append((doc_id, tf))
+        return cls(dict(postings), doc_lengths, k1, b)
+
+    def to_dict(self) -> dict:
+        return {"postings": self.postings, "doc_lengths": self.doc_lengths, "k1": self.k1, "b": self.b}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "BM25Index":
+        postings = {term: [tuple(p) for p in docs] for term, docs in data["postings"].items()}
+        return cls(postings, data["doc_lengths"], data["k1"], data["b"])
+
+    def search(self, query: str, k: int = 3) -> List[int]:
+        # Only documents sharing a term with the query are scored
+        scores: Dict[int, float] = defaultdict(float)
+        for term in set(tokenize(query)):
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, tf in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / self.avg_length)
+                scores[doc_id] += idf * tf * (self.k1 + 1) / (tf + norm)
+        return [doc_id for doc_id, _ in heapq.nlargest(k, scores.items(), key=lambda item: item[1])]
+
+# --- Reciprocal rank fusion of several rankings (lists of doc ids, best first) ---
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = 3, rrf_k: int = 60) -> List[int]:
+    scores: Dict[int, float] = defaultdict(float)
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] += 1.0 / (rrf_k + rank + 1)
+    return [doc_id for doc_id, _ in heapq.nlargest(k, scores.items(), key=lambda item: item[1])]
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+# --- Cache key: everything that changes the completion ---
+def make_cache_key(model: str, messages: list, temperature: float, template_version: str) -> str:
+    payload = json.dumps(
+        {"model": model, "messages": messages, "temperature": temperature, "template_version": template_version},
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+# --- In-memory LRU backend ---
+class MemoryBackend:
+    def __init__(self, max_entries: int = 1024):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Tuple[float, str]]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def set(self, key: str, created: float, value: str):
+        self._entries[key] = (created, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def clear(self):
+        self._entries.clear()
+
+# --- SQLite backend, shared across processes and restarts ---
+class SQLiteBackend:
+    def __init__(self, path: str = ".llm_cache.sqlite", max_entries: int = 10000):
+        self.max_entries = max_entries
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS llm_cache (key TEXT PRIMARY KEY, created REAL, accessed REAL, value TEXT)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS llm_cache_accessed ON llm_cache (accessed)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[float, str]]:
+        row = self._conn.execute("SELECT created, value FROM llm_cache WHERE key = ?", (key,)).fetchone()
+        if row is not None:
+            self._conn.execute("UPDATE llm_cache SET accessed = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+        return row
+
+    def set(self, key: str, created: float, value: str):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO llm_cache (key, created, accessed, value) VALUES (?, ?, ?, ?)",
+            (key, created, created, value),
+        )
+        # Evict least recently used rows beyond the size bound
+        self._conn.execute(
+            "DELETE FROM llm_cache WHERE key IN (SELECT key FROM llm_cache ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+        self._conn.commit()
+
+    def delete(self, key: str):
+        self._conn.execute("DELETE FROM llm_cache WHERE key = ?", (key,))
+        self._conn.commit()
+
+    def clear(self):
+        self._conn.execute("DELETE FROM llm_cache")
+        self._conn.commit()
+
+# --- Cache front-end with TTL and hit/miss counters ---
+class LLMCache:
+    def __init__(self, backend=None, ttl: float = 24 * 3600):
+        self.backend = backend if backend is not None else MemoryBackend()
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            entry = self.backend.get(key)
+            if entry is not None and time.time() - entry[0] > self.ttl:
+                self.backend.delete(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self.backend.set(key, time.time(), value)
+
+    def clear(self):
+        with self._lock:
+            self.backend.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+_cache: Optional[LLMCache] = None
+_cache_lock = threading.Lock()
+
+def get_llm_cache() -> LLMCache:
+    # Backend is chosen with LLM_CACHE_BACKEND=memory|sqlite
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            ttl = float(os.environ.get("LLM_CACHE_TTL", 24 * 3600))
+            max_entries = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", 1024))
+            if os.environ.get("LLM_CACHE_BACKEND", "memory") == "sqlite":
+                backend = SQLiteBackend(os.environ.get("LLM_CACHE_PATH", ".llm_cache.sqlite"), max_entries)
+            else:
+                backend = MemoryBackend(max_entries)
+            _cache = LLMCache(backend, ttl)
+    return _cache
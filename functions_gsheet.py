@@ -0,0 +1,212 @@
+import atexit
+import os
+import random
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+
+import gspread
+import streamlit as st
+
+from functions_metrics import span
+
+SHEET_COLUMNS = ["topic", "chat", "timestamp"]
+
+# --- Open the worksheet with the same credentials as the "gsheets" connection ---
+def open_worksheet(worksheet: str = "Sheet1") -> gspread.Worksheet:
+    creds = dict(st.secrets["connections"]["gsheets"])
+    spreadsheet = creds.pop("spreadsheet")
+    creds.pop("worksheet", None)
+    gc = gspread.service_account_from_dict(creds)
+    if spreadsheet.startswith("http"):
+        return gc.open_by_url(spreadsheet).worksheet(worksheet)
+    return gc.open_by_key(spreadsheet).worksheet(worksheet)
+
+# --- Write-behind queue that appends rows in batches ---
+class SheetWriter:
+    def __init__(self, worksheet: str = "Sheet1", batch_size: int = 20, flush_interval: float = 5.0, max_retries: int = 5, base_delay: float = 1.0, opener: Callable[[str], gspread.Worksheet] = open_worksheet):
+        self.worksheet_name = worksheet
+        self.opener = opener
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self._worksheet: Optional[gspread.Worksheet] = None
+        self._header_checked = False
+        self._rows: Deque[List[str]] = deque()
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="gsheet-writer", daemon=True)
+        self._thread.start()
+        atexit.register(self.flush)
+
+    def enqueue(self, row: List[str]):
+        with self._lock:
+            self._rows.append(row)
+            full = len(self._rows) >= self.batch_size
+        if full:
+            self._wake.set()
+
+    def pending(self) -> int:
+        with self._lock:
+            return len(self._rows)
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def _append(self, rows: List[List[str]]):
+        if self._worksheet is None:
+            self._worksheet = self.opener(self.worksheet_name)
+        batch = rows
+        if not self._header_checked:
+            # Only an empty sheet needs the header row the dashboard reads by
+            with span("gsheet.read", purpose="header"):
+                header = self._worksheet.row_values(1)
+            if not header:
+                batch = [SHEET_COLUMNS] + rows
+            elif header != SHEET_COLUMNS[:len(header)]:
+                raise ValueError(f"Unexpected sheet columns {header}, expected {SHEET_COLUMNS}")
+            else:
+                # Sheets written before a column was added get its header cell
+                for col in range(len(header), len(SHEET_COLUMNS)):
+                    self._worksheet.update_cell(1, col + 1, SHEET_COLUMNS[col])
+        # append_rows only adds rows after the last one, so concurrent writers never overwrite each other
+        with span("gsheet.write", rows=len(batch)):
+            self._worksheet.append_rows(batch, value_input_option="RAW")
+        # Only now: if the append failed, the retry checks the header again and re-adds it when still missing
+        self._header_checked = True
+
+    def flush(self):
+        with self._flush_lock:
+            with self._lock:
+                rows = list(self._rows)
+                self._rows.clear()
+            if not rows:
+                return
+
+            for attempt in range(self.max_retries):
+                try:
+                    self._append(rows)
+                    return
+                except Exception as e:
+                    delay = self.base_delay * (2 ** attempt) * (0.5 + random.random())
+                    print(f"Error saving to Google Sheets (attempt {attempt + 1}/{self.max_retries}): {e}")
+                    time.sleep(delay)
+
+            # Keep the rows for the next flush instead of dropping them
+            with self._lock:
+                self._rows.extendleft(reversed(rows))
+
+_writer: Optional[SheetWriter] = None
+_writer_lock = threading.Lock()
+
+def get_sheet_writer() -> SheetWriter:
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = SheetWriter()
+    return _writer
+
+def set_sheet_writer(writer: SheetWriter):
+    # Replace the process-wide writer, e.g. with one backed by a local stand-in sheet
+    global _writer
+    with _writer_lock:
+        _writer = writer
+
+# --- Local SQLite mirror of the sheet for the Manager dashboard ---
+def _cell(values_row: List[str], columns: Dict[str, int], name: str) -> str:
+    # Trailing empty cells are left out of the rows the Sheets API returns
+    i = columns.get(name)
+    return values_row[i] if i is not None and i < len(values_row) else ""
+
+# The sheet is append-only, so each sync only reads the rows added since the previous one
+class SheetMirror:
+    def __init__(self, path: str = ".sheet_mirror.sqlite", worksheet: str = "Sheet1", max_age: float = 60.0, opener: Callable[[str], gspread.Worksheet] = open_worksheet):
+        self.worksheet_name = worksheet
+        self.max_age = max_age
+        self.opener = opener
+        self._worksheet: Optional[gspread.Worksheet] = None
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sessions (row INTEGER PRIMARY KEY, topic TEXT, chat TEXT, timestamp TEXT);
+            CREATE INDEX IF NOT EXISTS sessions_topic_timestamp ON sessions (topic, timestamp);
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        self._conn.commit()
+
+    def _meta(self, key: str, default: str) -> str:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def last_synced(self) -> float:
+        with self._lock:
+            return float(self._meta("last_synced", "0"))
+
+    def sync(self, full: bool = False) -> int:
+        # Returns the number of new rows copied from the sheet
+        with self._lock:
+            if self._worksheet is None:
+                self._worksheet = self.opener(self.worksheet_name)
+            if full:
+                self._conn.execute("DELETE FROM sessions")
+                self._conn.execute("DELETE FROM meta WHERE key = 'synced_rows'")
+
+            synced_rows = int(self._meta("synced_rows", "0"))
+            with span("gsheet.read", purpose="mirror_sync", from_row=synced_rows + 2):
+                header = self._worksheet.row_values(1)
+                if not header:
+                    values = []
+                else:
+                    last_col = chr(ord("A") + len(header) - 1)
+                    values = self._worksheet.get(f"A{synced_rows + 2}:{last_col}")
+
+            columns: Dict[str, int] = {name: i for i, name in enumerate(header)}
+            new_rows = [
+                (synced_rows + offset + 2, *(_cell(values_row, columns, name) for name in SHEET_COLUMNS))
+                for offset, values_row in enumerate(values)
+            ]
+
+            self._conn.executemany("INSERT OR REPLACE INTO sessions (row, topic, chat, timestamp) VALUES (?, ?, ?, ?)", new_rows)
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('synced_rows', ?)", (str(synced_rows + len(new_rows)),))
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('last_synced', ?)", (str(time.time()),))
+            self._conn.commit()
+            return len(new_rows)
+
+    def ensure_fresh(self, max_age: float = None):
+        max_age = self.max_age if max_age is None else max_age
+        if time.time() - self.last_synced() > max_age:
+            self.sync()
+
+    def topics(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT topic FROM sessions WHERE topic != '' ORDER BY topic")]
+
+    def topic_chats(self, topic: str) -> List[str]:
+        with self._lock:
+            # Sheet order, so map-reduce shards stay stable as sessions are added
+            return [row[0] for row in self._conn.execute("SELECT chat FROM sessions WHERE topic = ? ORDER BY row", (topic,))]
+
+_mirror: Optional[SheetMirror] = None
+_mirror_lock = threading.Lock()
+
+def get_sheet_mirror() -> SheetMirror:
+    global _mirror
+    with _mirror_lock:
+        if _mirror is None:
+            _mirror = SheetMirror(
+                os.environ.get("SHEET_MIRROR_PATH", ".sheet_mirror.sqlite"),
+                max_age=float(os.environ.get("SHEET_MIRROR_MAX_AGE", 60)),
+            )
+    return _mirror
+
+def set_sheet_mirror(mirror: SheetMirror):
+    global _mirror
+    with _mirror_lock:
+        _mirror = mirror
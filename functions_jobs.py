@@ -0,0 +1,96 @@
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
+# One pool of workers shared by every Streamlit session, so concurrent trainees queue up
+# instead of each holding a script thread for the length of an OpenAI call
+MAX_WORKERS = int(os.environ.get("LLM_JOB_WORKERS", 16))
+# Finished jobs nobody collected (closed tabs) are dropped after this many seconds
+JOB_RETENTION = 3600
+
+_executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="llm-job")
+
+# --- A submitted call; the text produced so far can be read while it runs ---
+class Job:
+    def __init__(self):
+        self.parts: List[str] = []
+        self.cancelled = threading.Event()
+        self.created = time.time()
+        self.future: Optional[Future] = None
+        self.error: Optional[str] = None
+
+    @property
+    def text(self) -> str:
+        return "".join(self.parts)
+
+    def done(self) -> bool:
+        return self.future is not None and self.future.done()
+
+    def cancel(self):
+        self.cancelled.set()
+        if self.future is not None:
+            self.future.cancel()
+
+def _run(job: Job, fn: Callable, args: tuple, kwargs: dict):
+    if job.cancelled.is_set():
+        return
+    try:
+        result = fn(*args, **kwargs)
+        if isinstance(result, str):
+            job.parts.append(result)
+            return
+        # Streamed result: collect deltas until done or cancelled
+        try:
+            for delta in result:
+                if job.cancelled.is_set():
+                    break
+                job.parts.append(delta)
+        finally:
+            if hasattr(result, "close"):
+                result.close()
+    except Exception as e:
+        job.error = str(e)
+
+_jobs: Dict[str, Job] = {}
+_jobs_lock = threading.Lock()
+
+def _prune_jobs():
+    cutoff = time.time() - JOB_RETENTION
+    for job_id in [job_id for job_id, job in _jobs.items() if job.done() and job.created < cutoff]:
+        del _jobs[job_id]
+
+def submit_job(fn: Callable, *args, **kwargs) -> str:
+    job = Job()
+    job_id = uuid.uuid4().hex
+    with _jobs_lock:
+        _prune_jobs()
+        _jobs[job_id] = job
+    job.future = _executor.submit(_run, job, fn, args, kwargs)
+    return job_id
+
+def get_job(job_id: str) -> Optional[Job]:
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+def pop_job(job_id: str) -> Optional[Job]:
+    with _jobs_lock:
+        return _jobs.pop(job_id, None)
+
+def wait_for_job(job_id: str, timeout: float = None) -> Optional[Job]:
+    # Blocks until the job finishes, then removes and returns it (None if unknown or cancelled)
+    job = pop_job(job_id)
+    if job is None or job.future is None:
+        return None
+    try:
+        job.future.result(timeout)
+    except Exception:
+        return None
+    return job if not job.cancelled.is_set() else None
+
+def cancel_job(job_id: str):
+    job = pop_job(job_id)
+    if job is not None:
+        job.cancel()
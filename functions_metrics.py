@@ -0,0 +1,65 @@
+import json
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from typing import Deque, Dict, List
+
+# Number of most recent spans kept per stage for the rolling percentiles
+WINDOW_SIZE = 1000
+
+logger = logging.getLogger("nubo.timing")
+if not logger.handlers:
+    _handler = logging.StreamHandler()
+    _handler.setFormatter(logging.Formatter("%(message)s"))
+    logger.addHandler(_handler)
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+
+_spans: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=WINDOW_SIZE))
+_spans_lock = threading.Lock()
+
+# --- Record a finished span: one JSON log line + the in-memory window ---
+def record_span(stage: str, seconds: float, **attrs):
+    with _spans_lock:
+        _spans[stage].append(seconds)
+    logger.info(json.dumps({"span": stage, "ms": round(seconds * 1000, 2), **attrs}, default=str))
+
+# --- Time a block; attributes can be added to the yielded dict while it runs ---
+@contextmanager
+def span(stage: str, **attrs):
+    start = time.perf_counter()
+    info = dict(attrs)
+    try:
+        yield info
+    finally:
+        record_span(stage, time.perf_counter() - start, **info)
+
+def percentile(ordered: List[float], pct: float) -> float:
+    if not ordered:
+        return 0.0
+    rank = (len(ordered) - 1) * pct / 100
+    low = int(rank)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (rank - low)
+
+# --- Rolling p50/p95/p99 per stage, in milliseconds ---
+def stage_stats() -> Dict[str, dict]:
+    with _spans_lock:
+        windows = {stage: sorted(values) for stage, values in _spans.items()}
+    return {
+        stage: {
+            "count": len(ordered),
+            "p50_ms": percentile(ordered, 50) * 1000,
+            "p95_ms": percentile(ordered, 95) * 1000,
+            "p99_ms": percentile(ordered, 99) * 1000,
+            "max_ms": ordered[-1] * 1000,
+        }
+        for stage, ordered in sorted(windows.items())
+        if ordered
+    }
+
+def reset_stats():
+    with _spans_lock:
+        _spans.clear()
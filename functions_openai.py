@@ -0,0 +1,116 @@
+import random
+import threading
+import time
+from typing import Iterator, Optional
+
+import httpx
+import openai
+
+# Rough prompt size estimate used for the tokens-per-minute budget (about 4 characters per token)
+CHARS_PER_TOKEN = 4
+# Completion tokens reserved per request when the caller does not set max_tokens
+DEFAULT_COMPLETION_TOKENS = 500
+
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.InternalServerError,
+)
+
+# --- Token bucket: `rate_per_minute` units refill continuously, up to one minute's worth ---
+class TokenBucket:
+    def __init__(self, rate_per_minute: float):
+        self.capacity = float(rate_per_minute)
+        self.rate = rate_per_minute / 60.0
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0):
+        # A single request larger than the bucket only waits for a full bucket
+        amount = min(amount, self.capacity)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= amount:
+                    self._tokens -= amount
+                    return
+                wait = (amount - self._tokens) / self.rate
+            time.sleep(wait)
+
+# --- Shared OpenAI client with keep-alive connections, rate limits and retries ---
+class PooledOpenAIClient:
+    def __init__(self, api_key: str, base_url: Optional[str] = None, timeout: float = 60.0, max_concurrency: int = 8, requests_per_minute: int = 500, tokens_per_minute: int = 30000, max_retries: int = 4, base_delay: float = 1.0):
+        self.client = openai.OpenAI(
+            api_key=api_key,
+            base_url=base_url,
+            timeout=timeout,
+            # Retries are done here so they go through the rate limiter too
+            max_retries=0,
+            http_client=httpx.Client(
+                timeout=timeout,
+                limits=httpx.Limits(max_connections=max_concurrency, max_keepalive_connections=max_concurrency),
+            ),
+        )
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self._requests = TokenBucket(requests_per_minute)
+        self._tokens = TokenBucket(tokens_per_minute)
+        self._slots = threading.BoundedSemaphore(max_concurrency)
+
+    def _acquire(self, messages: list, max_tokens: Optional[int]):
+        prompt_chars = sum(len(str(m.get("content", ""))) for m in messages)
+        self._requests.acquire(1)
+        self._tokens.acquire(prompt_chars / CHARS_PER_TOKEN + (max_tokens or DEFAULT_COMPLETION_TOKENS))
+
+    def _backoff(self, attempt: int, error: Exception):
+        delay = self.base_delay * (2 ** attempt)
+        # Honour the server's Retry-After when it sends one
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                delay = max(delay, float(retry_after))
+            except ValueError:
+                pass
+        time.sleep(delay * (0.5 + random.random()))
+
+    def chat_completion(self, model: str, messages: list, **kwargs):
+        for attempt in range(self.max_retries + 1):
+            self._acquire(messages, kwargs.get("max_tokens"))
+            try:
+                with self._slots:
+                    return self.client.chat.completions.create(model=model, messages=messages, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                if attempt == self.max_retries:
+                    raise
+                self._backoff(attempt, e)
+
+    def stream_chat_completion(self, model: str, messages: list, **kwargs) -> Iterator:
+        # Retries only happen before the first chunk; a stream that breaks halfway raises
+        for attempt in range(self.max_retries + 1):
+            self._acquire(messages, kwargs.get("max_tokens"))
+            with self._slots:
+                try:
+                    stream = self.client.chat.completions.create(model=model, messages=messages, stream=True, **kwargs)
+                except RETRYABLE_ERRORS as e:
+                    if attempt == self.max_retries:
+                        raise
+                    error = e
+                else:
+                    yield from stream
+                    return
+            self._backoff(attempt, error)
+
+_client: Optional[PooledOpenAIClient] = None
+_client_lock = threading.Lock()
+
+def get_pooled_client(api_key: str, **settings) -> PooledOpenAIClient:
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = PooledOpenAIClient(api_key, **settings)
+    return _client
@@ -0,0 +1,96 @@
+import json
+import os
+import threading
+from types import MappingProxyType
+from typing import Dict, Mapping, NamedTuple, Optional, Tuple
+
+# Versioned question bank; edits are picked up on the next lookup without a restart
+QUESTION_BANK_PATH = os.environ.get("QUESTION_BANK_PATH", "question_bank.json")
+SUPPORTED_VERSIONS = (1,)
+
+# --- One question; retrieval context for built-in questions is precomputed in rag_precomputed.json ---
+class Question(NamedTuple):
+    id: str
+    text: str
+
+# --- Parsed bank: immutable, so readers never need the lock ---
+class QuestionBank(NamedTuple):
+    version: int
+    knowledge_types: Mapping[str, str]
+    default_knowledge_type: str
+    default_questions: Tuple[str, ...]
+    index: Mapping[Tuple[str, str], Tuple[Question, ...]]
+
+    def knowledge_key(self, knowledge_type: str) -> str:
+        return self.knowledge_types.get(knowledge_type, self.default_knowledge_type)
+
+    def lookup(self, topic: str, knowledge_type: str) -> Optional[Tuple[Question, ...]]:
+        return self.index.get((topic, self.knowledge_key(knowledge_type)))
+
+def _question(set_name: str, position: int, item) -> Question:
+    # Items are plain strings, or {"id": ..., "text": ...} objects when they need a fixed id
+    if isinstance(item, str):
+        return Question(f"{set_name}-{position + 1}", item)
+    return Question(item.get("id", f"{set_name}-{position + 1}"), item["text"])
+
+def parse_question_bank(data: dict) -> QuestionBank:
+    version = data.get("version")
+    if version not in SUPPORTED_VERSIONS:
+        raise ValueError(f"Unsupported question bank version: {version}")
+
+    # Shared sets are parsed once, so topics that reuse a set share the same tuple
+    sets = {
+        name: tuple(_question(name, i, item) for i, item in enumerate(items))
+        for name, items in data["question_sets"].items()
+    }
+    index: Dict[Tuple[str, str], Tuple[Question, ...]] = {}
+    for topic, by_knowledge_type in data["topics"].items():
+        for knowledge_key, set_name in by_knowledge_type.items():
+            if set_name not in sets:
+                raise ValueError(f"Topic {topic!r} refers to unknown question set {set_name!r}")
+            index[(topic, knowledge_key)] = sets[set_name]
+
+    return QuestionBank(
+        version,
+        MappingProxyType(dict(data.get("knowledge_types", {}))),
+        data["default_knowledge_type"],
+        tuple(data["default_questions"]),
+        MappingProxyType(index),
+    )
+
+_bank: Dict[str, object] = {"stamp": None, "bank": None}
+_bank_lock = threading.Lock()
+
+def get_question_bank(path: str = QUESTION_BANK_PATH) -> QuestionBank:
+    try:
+        stamp = (path, os.stat(path).st_mtime_ns)
+    except OSError:
+        # Briefly missing, e.g. during an editor's atomic save: keep the last good bank
+        if _bank["bank"] is None:
+            raise
+        return _bank["bank"]
+    if _bank["stamp"] != stamp:
+        with _bank_lock:
+            if _bank["stamp"] != stamp:
+                try:
+                    with open(path, encoding="utf-8") as f:
+                        bank = parse_question_bank(json.load(f))
+                except (OSError, ValueError, KeyError, TypeError) as e:
+                    # A broken edit keeps the last good bank in use until the file changes again
+                    if _bank["bank"] is None:
+                        raise
+                    print(f"Ignoring invalid question bank {path}: {e}")
+                    bank = _bank["bank"]
+                _bank.update(stamp=stamp, bank=bank)
+    return _bank["bank"]
+
+def get_question_entries(topic: str, knowledge_type: str) -> Tuple[Question, ...]:
+    bank = get_question_bank()
+    entries = bank.lookup(topic, knowledge_type)
+    if entries is None:
+        # Unknown topic: generic questions with the topic filled in
+        entries = tuple(
+            Question(f"default-{i + 1}", template.replace("{topic}", topic))
+            for i, template in enumerate(bank.default_questions)
+        )
+    return entries
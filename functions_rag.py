@@ -1,61 +1,586 @@
-import fitz  # PyMuPDF
-import faiss
-import numpy as np
-from sentence_transformers import SentenceTransformer
-from typing import List, Tuple
+from __future__ import annotations
+
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functions_bm25 import BM25Index, reciprocal_rank_fusion
+from functions_metrics import record_span, span
+from typing import TYPE_CHECKING, Callable, Dict, Iterable, Iterator, List, Tuple
+
+# torch (via sentence_transformers), faiss, numpy and PyMuPDF are imported on first RAG use,
+# so importing this module (and the app) does not pay for them
+if TYPE_CHECKING:
+    import faiss
+    import numpy as np
+    from sentence_transformers import SentenceTransformer
+
+# Directory where built indexes (FAISS index + chunks + embeddings) are stored
+INDEX_CACHE_DIR = os.environ.get("RAG_INDEX_CACHE_DIR", ".rag_cache")
 
 #Step 1: Read and split PDF into chunks
-def extract_pdf_chunks(pdf_path: str, chunk_size: int = 500) -> List[str]:
-    doc = fitz.open(pdf_path)
-    text = ""
-    for page in doc:
-        text += page.get_text()
-
-    # Simple chunking by sentence length
-    chunks = []
-    current_chunk = ""
-    for sentence in text.split(". "):
-        if len(current_chunk) + len(sentence) < chunk_size:
-            current_chunk += sentence + ". "
-        else:
-            chunks.append(current_chunk.strip())
-            current_chunk = sentence + ". "
-    if current_chunk:
-        chunks.append(current_chunk.strip())
+# Documents with at least this many pages are extracted across a process pool
+PARALLEL_EXTRACT_MIN_PAGES = 100
+PAGES_PER_TASK = 16
+# Extraction workers never fork the server process: it runs many threads (warm-up, job pool,
+# sheet writer, torch), and forking a multithreaded process can deadlock the child
+_EXTRACT_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+def _extract_page_range(task: Tuple[str, int, int]) -> List[str]:
+    import fitz  # PyMuPDF
+    pdf_path, start, end = task
+    with fitz.open(pdf_path) as doc:
+        return [doc[page_no].get_text() for page_no in range(start, end)]
+
+def iter_pdf_pages(pdf_path: str, workers: int = None) -> Iterator[Tuple[int, str]]:
+    # workers=None: use every core for large documents, read sequentially otherwise
+    import fitz  # PyMuPDF
+    with fitz.open(pdf_path) as doc:
+        page_count = doc.page_count
+        if workers is None:
+            workers = (os.cpu_count() or 1) if page_count >= PARALLEL_EXTRACT_MIN_PAGES else 1
+        if workers <= 1:
+            for page_no, page in enumerate(doc):
+                yield page_no, page.get_text()
+            return
+
+    tasks = [(pdf_path, start, min(start + PAGES_PER_TASK, page_count)) for start in range(0, page_count, PAGES_PER_TASK)]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(_EXTRACT_START_METHOD)) as pool:
+        # map() returns results in page order, so chunks come out in document order
+        for (_, start, _), texts in zip(tasks, pool.map(_extract_page_range, tasks)):
+            for i, text in enumerate(texts):
+                yield start + i, text
+
+def _iter_sentences(pages: Iterable[Tuple[int, str]]) -> Iterator[Tuple[str, int, int]]:
+    # Yields (sentence, page, character offset in the document); only the unfinished
+    # last sentence of a page is carried over, so each page's text is copied once
+    carry, carry_page, carry_offset = "", 0, 0
+    offset = 0
+    for page_no, text in pages:
+        if not carry:
+            carry_page, carry_offset = page_no, offset
+        pieces = (carry + text).split(". ")
+        position = carry_offset
+        for i, piece in enumerate(pieces[:-1]):
+            yield piece, carry_page if i == 0 else page_no, position
+            position += len(piece) + 2
+        carry = pieces[-1]
+        if len(pieces) > 1:
+            carry_page, carry_offset = page_no, position
+        offset += len(text)
+    yield carry, carry_page, carry_offset
+
+def _timed_pages(pages: Iterator[Tuple[int, str]], timer: dict) -> Iterator[Tuple[int, str]]:
+    # Adds the time spent producing pages to timer["seconds"], separately from the chunking around it
+    while True:
+        start = time.perf_counter()
+        item = next(pages, None)
+        timer["seconds"] += time.perf_counter() - start
+        if item is None:
+            return
+        timer["pages"] += 1
+        yield item
+
+def _chunk_pages(pages: Iterable[Tuple[int, str]], chunk_size: int, overlap: int) -> Iterator[dict]:
+    # Simple chunking by sentence length; with overlap > 0, up to that many characters of
+    # trailing sentences are repeated at the start of the next chunk
+    current: List[Tuple[str, int, int]] = []
+    current_len = 0
+    for sentence, page_no, offset in _iter_sentences(pages):
+        part = sentence + ". "
+        if current and current_len + len(sentence) >= chunk_size:
+            text = "".join(p for p, _, _ in current).strip()
+            if text:
+                yield {"text": text, "page": current[0][1], "offset": current[0][2]}
+            # The first sentence is never carried, so every chunk starts past the previous one's start
+            tail, tail_len = [], 0
+            for item in reversed(current[1:]):
+                if tail_len + len(item[0]) > overlap:
+                    break
+                tail.insert(0, item)
+                tail_len += len(item[0])
+            current, current_len = tail, tail_len
+        current.append((part, page_no, offset))
+        current_len += len(part)
 
+    text = "".join(p for p, _, _ in current).strip()
+    if text:
+        yield {"text": text, "page": current[0][1], "offset": current[0][2]}
+
+def _check_overlap(chunk_size: int, overlap: int):
+    if not 0 <= overlap < chunk_size:
+        raise ValueError(f"overlap must be at least 0 and smaller than chunk_size ({chunk_size}), got {overlap}")
+
+def iter_pdf_chunks(pdf_path: str, chunk_size: int = 500, overlap: int = 0, workers: int = None) -> Iterator[dict]:
+    _check_overlap(chunk_size, overlap)
+    return _chunk_pages(iter_pdf_pages(pdf_path, workers), chunk_size, overlap)
+
+def extract_pdf_chunks(pdf_path: str, chunk_size: int = 500, overlap: int = 0, workers: int = None) -> List[str]:
+    _check_overlap(chunk_size, overlap)
+    start = time.perf_counter()
+    timer = {"seconds": 0.0, "pages": 0}
+    pages = _timed_pages(iter_pdf_pages(pdf_path, workers), timer)
+    chunks = [chunk["text"] for chunk in _chunk_pages(pages, chunk_size, overlap)]
+    record_span("pdf.extract", timer["seconds"], pdf=pdf_path, pages=timer["pages"])
+    record_span("pdf.chunk", time.perf_counter() - start - timer["seconds"], pdf=pdf_path, chunks=len(chunks))
     return chunks
 
+# --- Embedding model registry ---
+# Backends: "torch" (SentenceTransformer in full precision) or "onnx-int8" (same model through
+# ONNX Runtime with dynamic int8 quantization, for CPU-only servers)
+EMBEDDING_BACKEND = os.environ.get("EMBEDDING_BACKEND", "torch")
+# CPU instruction set the int8 model is quantized for: "avx2", "avx512", "avx512_vnni" or "arm64"
+ONNX_QUANTIZATION_CONFIG = os.environ.get("ONNX_QUANTIZATION_CONFIG", "avx2")
+# Stored embeddings and FAISS vectors: "float32" or "float16" (half the memory)
+EMBEDDING_STORAGE_DTYPE = os.environ.get("EMBEDDING_STORAGE_DTYPE", "float32")
+
+# One model per (model name, backend) for the whole process, shared across Streamlit sessions
+_models: Dict[Tuple[str, str], SentenceTransformer] = {}
+_models_lock = threading.Lock()
+_warm_up_thread = None
+# Separate from _models_lock, which is held for a whole model load
+_warm_up_lock = threading.Lock()
+
+def _load_onnx_int8_model(model_name: str) -> SentenceTransformer:
+    from sentence_transformers import SentenceTransformer, export_dynamic_quantized_onnx_model
+    # Quantize once and keep the result next to the index store
+    save_dir = os.path.join(INDEX_CACHE_DIR, "onnx", model_name.replace("/", "_"))
+    file_name = f"onnx/model_qint8_{ONNX_QUANTIZATION_CONFIG}.onnx"
+    if not os.path.exists(os.path.join(save_dir, file_name)):
+        model = SentenceTransformer(model_name, backend="onnx")
+        model.save(save_dir)
+        export_dynamic_quantized_onnx_model(model, ONNX_QUANTIZATION_CONFIG, save_dir, file_suffix=f"qint8_{ONNX_QUANTIZATION_CONFIG}")
+    return SentenceTransformer(save_dir, backend="onnx", model_kwargs={"file_name": file_name})
+
+def get_embedding_model(model_name: str = "all-MiniLM-L6-v2", backend: str = None) -> SentenceTransformer:
+    key = (model_name, backend or EMBEDDING_BACKEND)
+    model = _models.get(key)
+    if model is None:
+        with _models_lock:
+            # Re-check: another session may have loaded it while we waited for the lock
+            model = _models.get(key)
+            if model is None:
+                if key[1] == "onnx-int8":
+                    model = _load_onnx_int8_model(model_name)
+                elif key[1] == "torch":
+                    from sentence_transformers import SentenceTransformer
+                    model = SentenceTransformer(model_name)
+                else:
+                    raise ValueError(f"Unknown embedding backend: {key[1]}")
+                _models[key] = model
+    return model
+
+def warm_up_rag(corpora: List[Tuple[List[str], str, str]] = (), model_names: Tuple[str, ...] = ("all-MiniLM-L6-v2",)) -> threading.Thread:
+    # Load models, then load or build each (sources, index_type, mode) corpus index, in a background
+    # thread so the first RAG answer does not pay for it. BM25-only corpora never load a model.
+    global _warm_up_thread
+    # Called at the end of every rerun: once started, return without taking any lock
+    if _warm_up_thread is not None:
+        return _warm_up_thread
+
+    def warm_up():
+        # Corpora without PDFs have nothing to retrieve from, so they never load torch or a model
+        present = [(sources, index_type, mode) for sources, index_type, mode in corpora if list_corpus_pdfs(sources)]
+        if any(mode != "bm25" for _, _, mode in present):
+            for name in model_names:
+                get_embedding_model(name)
+        for sources, index_type, mode in present:
+            if mode != "dense":
+                load_or_build_bm25_index(sources)
+            if mode != "bm25":
+                load_or_build_corpus_index(sources, index_type=index_type)
+
+    with _warm_up_lock:
+        if _warm_up_thread is None:
+            _warm_up_thread = threading.Thread(target=warm_up, name="rag-warm-up", daemon=True)
+            _warm_up_thread.start()
+    return _warm_up_thread
+
 # Step 2: Embed chunks
-def embed_chunks(chunks: List[str], model_name: str = "all-MiniLM-L6-v2") -> Tuple[np.ndarray, List[str]]:
-    model = SentenceTransformer(model_name)
-    embeddings = model.encode(chunks, convert_to_numpy=True)
-    return embeddings, chunks
+def embed_chunks(chunks: List[str], model: SentenceTransformer) -> Tuple[np.ndarray, List[str]]:
+    with span("rag.embed", chunks=len(chunks)):
+        embeddings = model.encode(chunks, convert_to_numpy=True)
+    return embeddings.astype(EMBEDDING_STORAGE_DTYPE, copy=False), chunks
 
 # Step 3: Store in FAISS index
-def create_faiss_index(embeddings: np.ndarray) -> faiss.IndexFlatL2:
-    index = faiss.IndexFlatL2(embeddings.shape[1])
+# index_type: "flat" (exact), "ivf" or "hnsw" (approximate, for large corpora), or "auto"
+APPROXIMATE_INDEX_THRESHOLD = 20000
+
+def create_faiss_index(embeddings: np.ndarray, index_type: str = "flat") -> faiss.Index:
+    import numpy as np
+    embeddings = np.ascontiguousarray(embeddings, dtype=np.float32)
+    n, dim = embeddings.shape
+    if index_type == "auto":
+        index_type = "hnsw" if n >= APPROXIMATE_INDEX_THRESHOLD else "flat"
+
+    with span("rag.index_build", vectors=n, index_type=index_type):
+        return _build_faiss_index(embeddings, index_type)
+
+def _build_faiss_index(embeddings: np.ndarray, index_type: str) -> faiss.Index:
+    import faiss
+    import numpy as np
+    n, dim = embeddings.shape
+    # float16 storage keeps vectors as half floats inside the index too
+    fp16 = EMBEDDING_STORAGE_DTYPE == "float16"
+    if index_type == "flat":
+        if fp16:
+            index = faiss.IndexScalarQuantizer(dim, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2)
+        else:
+            index = faiss.IndexFlatL2(dim)
+    elif index_type == "hnsw":
+        if fp16:
+            index = faiss.IndexHNSWSQ(dim, faiss.ScalarQuantizer.QT_fp16, 32)
+        else:
+            index = faiss.IndexHNSWFlat(dim, 32)
+        index.hnsw.efSearch = 64
+    elif index_type == "ivf":
+        nlist = max(1, int(np.sqrt(n)))
+        if fp16:
+            index = faiss.IndexIVFScalarQuantizer(faiss.IndexFlatL2(dim), dim, nlist, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_L2)
+        else:
+            index = faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, nlist)
+        index.nprobe = min(nlist, 8)
+    else:
+        raise ValueError(f"Unknown FAISS index type: {index_type}")
+    if not index.is_trained:
+        index.train(embeddings)
     index.add(embeddings)
     return index
 
 # Step 4: Query and retrieve top-k relevant chunks
-def retrieve_relevant_chunks(query: str, index: faiss.IndexFlatL2, chunks: List[str], model: SentenceTransformer, k: int = 3) -> List[str]:
-    query_embedding = model.encode([query], convert_to_numpy=True)
-    distances, indices = index.search(query_embedding, k)
-    return [chunks[i] for i in indices[0]]
+def retrieve_relevant_chunks(query: str, index: faiss.Index, chunks: List[str], model: SentenceTransformer, k: int = 3) -> List[str]:
+    with span("rag.retrieve", k=k):
+        query_embedding = model.encode([query], convert_to_numpy=True)
+        distances, indices = index.search(query_embedding, k)
+    # Approximate indexes pad with -1 when fewer than k neighbours are found
+    return [chunks[i] for i in indices[0] if i >= 0]
+
+# --- On-disk index store ---
+# Indexes already loaded in this process, by cache key
+_loaded_indexes: Dict[str, Tuple[faiss.Index, List[str]]] = {}
+_build_lock = threading.RLock()
+# PDF content hashes, by (path, mtime, size), so unchanged files are not re-read
+_pdf_hashes: Dict[Tuple[str, int, int], str] = {}
+
+def _pdf_content_hash(pdf_path: str) -> str:
+    stat = os.stat(pdf_path)
+    stat_key = (os.path.abspath(pdf_path), stat.st_mtime_ns, stat.st_size)
+    if stat_key not in _pdf_hashes:
+        sha = hashlib.sha256()
+        with open(pdf_path, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha.update(block)
+        _pdf_hashes[stat_key] = sha.hexdigest()
+    return _pdf_hashes[stat_key]
+
+def index_cache_key(pdf_path: str, chunk_size: int = 500, model_name: str = "all-MiniLM-L6-v2") -> str:
+    raw = f"{_pdf_content_hash(pdf_path)}|{chunk_size}|{model_name}|{EMBEDDING_BACKEND}|{EMBEDDING_STORAGE_DTYPE}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+def _save_index(cache_path: str, index: faiss.Index, chunks: List[str], embeddings: np.ndarray = None):
+    import faiss
+    import numpy as np
+    # Write to a temp directory first so a crash never leaves a half-written store behind
+    tmp_path = f"{cache_path}.tmp{os.getpid()}"
+    os.makedirs(tmp_path, exist_ok=True)
+    faiss.write_index(index, os.path.join(tmp_path, "index.faiss"))
+    if embeddings is not None:
+        np.save(os.path.join(tmp_path, "embeddings.npy"), embeddings)
+    with open(os.path.join(tmp_path, "chunks.json"), "w", encoding="utf-8") as f:
+        json.dump(chunks, f, ensure_ascii=False)
+    try:
+        os.replace(tmp_path, cache_path)
+    except OSError:
+        # Another process finished the same build first; keep theirs
+        for name in os.listdir(tmp_path):
+            os.remove(os.path.join(tmp_path, name))
+        os.rmdir(tmp_path)
+
+def _load_index(cache_path: str) -> Tuple[faiss.Index, List[str]]:
+    import faiss
+    index_path = os.path.join(cache_path, "index.faiss")
+    try:
+        index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP)
+    except RuntimeError:
+        # Not every index type can be memory-mapped
+        index = faiss.read_index(index_path)
+    if isinstance(index, faiss.IndexIVF):
+        index.nprobe = min(index.nlist, 8)
+    with open(os.path.join(cache_path, "chunks.json"), encoding="utf-8") as f:
+        chunks = json.load(f)
+    return index, chunks
+
+def load_embeddings(pdf_path: str, chunk_size: int = 500, model_name: str = "all-MiniLM-L6-v2") -> np.ndarray:
+    import numpy as np
+    cache_path = os.path.join(INDEX_CACHE_DIR, index_cache_key(pdf_path, chunk_size, model_name))
+    return np.load(os.path.join(cache_path, "embeddings.npy"), mmap_mode="r")
+
+def _ensure_document_store(pdf_path: str, chunk_size: int, model_name: str) -> str:
+    # Builds the per-document store (chunks, embeddings and a flat index) on disk if missing
+    cache_path = os.path.join(INDEX_CACHE_DIR, index_cache_key(pdf_path, chunk_size, model_name))
+    # One build at a time, so a request and the warm-up thread never build the same store twice
+    with _build_lock:
+        if os.path.isdir(cache_path):
+            return cache_path
+
+        print("Extracting and chunking PDF...")
+        chunks = extract_pdf_chunks(pdf_path, chunk_size)
+
+        print("Embedding chunks...")
+        embeddings, chunks = embed_chunks(chunks, get_embedding_model(model_name))
+
+        print("Creating FAISS index...")
+        index = create_faiss_index(embeddings)
+
+        os.makedirs(INDEX_CACHE_DIR, exist_ok=True)
+        _save_index(cache_path, index, chunks, embeddings)
+        return cache_path
+
+def load_document_store(pdf_path: str, chunk_size: int = 500, model_name: str = "all-MiniLM-L6-v2") -> Tuple[List[str], np.ndarray]:
+    # Chunks and memory-mapped embeddings only; nothing is kept in memory, the per-document FAISS index is not read
+    cache_path = _ensure_document_store(pdf_path, chunk_size, model_name)
+    with open(os.path.join(cache_path, "chunks.json"), encoding="utf-8") as f:
+        chunks = json.load(f)
+    return chunks, load_embeddings(pdf_path, chunk_size, model_name)
+
+def load_or_build_index(pdf_path: str, chunk_size: int = 500, model_name: str = "all-MiniLM-L6-v2") -> Tuple[faiss.Index, List[str]]:
+    key = index_cache_key(pdf_path, chunk_size, model_name)
+    if key in _loaded_indexes:
+        return _loaded_indexes[key]
+
+    with _build_lock:
+        if key in _loaded_indexes:
+            return _loaded_indexes[key]
+
+        cache_path = os.path.join(INDEX_CACHE_DIR, key)
+        if os.path.isdir(cache_path):
+            print("Loading cached FAISS index...")
+        _loaded_indexes[key] = _load_index(_ensure_document_store(pdf_path, chunk_size, model_name))
+        return _loaded_indexes[key]
+
+# --- Topic corpora: one index per topic, built from a list of PDFs and/or directories of PDFs ---
+def list_corpus_pdfs(sources: List[str]) -> List[str]:
+    pdf_paths = []
+    for source in sources:
+        if os.path.isdir(source):
+            pdf_paths.extend(
+                os.path.join(source, name) for name in os.listdir(source) if name.lower().endswith(".pdf")
+            )
+        elif os.path.isfile(source):
+            pdf_paths.append(source)
+    return sorted(set(pdf_paths))
+
+def corpus_cache_key(sources: List[str], chunk_size: int = 500, model_name: str = "all-MiniLM-L6-v2", index_type: str = "auto") -> str:
+    doc_keys = [index_cache_key(path, chunk_size, model_name) for path in list_corpus_pdfs(sources)]
+    raw = "|".join(sorted(doc_keys)) + f"|{index_type}"
+    return "corpus-" + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+def load_or_build_corpus_index(sources: List[str], chunk_size: int = 500, model_name: str = "all-MiniLM-L6-v2", index_type: str = "auto") -> Tuple[faiss.Index, List[str]]:
+    import numpy as np
+    pdf_paths = list_corpus_pdfs(sources)
+    if not pdf_paths:
+        raise FileNotFoundError(f"No PDFs found in corpus: {sources}")
+    key = corpus_cache_key(sources, chunk_size, model_name, index_type)
+    if key in _loaded_indexes:
+        return _loaded_indexes[key]
+
+    # One build at a time, so a request and the warm-up thread never build the same index twice
+    with _build_lock:
+        if key in _loaded_indexes:
+            return _loaded_indexes[key]
+
+        cache_path = os.path.join(INDEX_CACHE_DIR, key)
+        if os.path.isdir(cache_path):
+            print("Loading cached corpus index...")
+            _loaded_indexes[key] = _load_index(cache_path)
+            return _loaded_indexes[key]
+
+        # Each document keeps its own embedding store, so adding a PDF only embeds that PDF
+        # and removing one only re-assembles the index from the stored embeddings
+        all_chunks, all_embeddings = [], []
+        # Only chunks and embeddings are read, so no per-document FAISS index stays in memory next to the corpus index
+        for pdf_path in pdf_paths:
+            doc_chunks, doc_embeddings = load_document_store(pdf_path, chunk_size, model_name)
+            all_chunks.extend(doc_chunks)
+            all_embeddings.append(doc_embeddings)
+
+        print(f"Creating FAISS index for {len(pdf_paths)} documents...")
+        index = create_faiss_index(np.concatenate(all_embeddings), index_type)
+
+        os.makedirs(INDEX_CACHE_DIR, exist_ok=True)
+        _save_index(cache_path, index, all_chunks)
+        _loaded_indexes[key] = (index, all_chunks)
+        return index, all_chunks
+
+# --- Keyword retrieval: BM25 over the same chunks, no embedding model needed ---
+# Chunk lists per PDF, by chunk cache key
+_loaded_chunks: Dict[str, List[str]] = {}
+
+def chunks_cache_key(pdf_path: str, chunk_size: int = 500) -> str:
+    raw = f"{_pdf_content_hash(pdf_path)}|{chunk_size}"
+    return "chunks-" + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+def _write_json_atomic(path: str, data):
+    tmp_path = f"{path}.tmp{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def load_or_build_chunks(pdf_path: str, chunk_size: int = 500) -> List[str]:
+    key = chunks_cache_key(pdf_path, chunk_size)
+    with _build_lock:
+        if key not in _loaded_chunks:
+            cache_path = os.path.join(INDEX_CACHE_DIR, key + ".json")
+            if os.path.isfile(cache_path):
+                with open(cache_path, encoding="utf-8") as f:
+                    _loaded_chunks[key] = json.load(f)
+            else:
+                print("Extracting and chunking PDF...")
+                chunks = extract_pdf_chunks(pdf_path, chunk_size)
+                os.makedirs(INDEX_CACHE_DIR, exist_ok=True)
+                _write_json_atomic(cache_path, chunks)
+                _loaded_chunks[key] = chunks
+        return _loaded_chunks[key]
+
+def bm25_cache_key(sources: List[str], chunk_size: int = 500) -> str:
+    # Documents in list_corpus_pdfs order, the same order the FAISS corpus index uses,
+    # so chunk ids line up for hybrid retrieval
+    doc_keys = [chunks_cache_key(path, chunk_size) for path in list_corpus_pdfs(sources)]
+    return "bm25-" + hashlib.sha256("|".join(doc_keys).encode("utf-8")).hexdigest()[:32]
+
+def load_or_build_bm25_index(sources: List[str], chunk_size: int = 500) -> Tuple[BM25Index, List[str]]:
+    pdf_paths = list_corpus_pdfs(sources)
+    if not pdf_paths:
+        raise FileNotFoundError(f"No PDFs found in corpus: {sources}")
+    key = bm25_cache_key(sources, chunk_size)
+    if key in _loaded_indexes:
+        return _loaded_indexes[key]
+
+    with _build_lock:
+        if key in _loaded_indexes:
+            return _loaded_indexes[key]
+
+        cache_path = os.path.join(INDEX_CACHE_DIR, key + ".json")
+        if os.path.isfile(cache_path):
+            print("Loading cached BM25 index...")
+            with open(cache_path, encoding="utf-8") as f:
+                data = json.load(f)
+            _loaded_indexes[key] = (BM25Index.from_dict(data["index"]), data["chunks"])
+            return _loaded_indexes[key]
+
+        chunks = []
+        for pdf_path in pdf_paths:
+            chunks.extend(load_or_build_chunks(pdf_path, chunk_size))
+
+        print(f"Creating BM25 index for {len(pdf_paths)} documents...")
+        with span("rag.index_build", vectors=len(chunks), index_type="bm25"):
+            index = BM25Index.build(chunks)
+
+        os.makedirs(INDEX_CACHE_DIR, exist_ok=True)
+        _write_json_atomic(cache_path, {"index": index.to_dict(), "chunks": chunks})
+        _loaded_indexes[key] = (index, chunks)
+        return index, chunks
+
+# --- Retrieval modes ---
+# "dense" (FAISS), "bm25" (keywords only, no embedding model) or "hybrid" (both, fused by reciprocal rank)
+RETRIEVAL_MODES = ("dense", "bm25", "hybrid")
+# In hybrid mode each retriever contributes this many times k candidates to the fusion
+HYBRID_CANDIDATES = 4
+
+def _retrieve(sources: List[str], queries: List[str], k: int, chunk_size: int, model_name: str, mode: str, load_dense: Callable[[], Tuple[faiss.Index, List[str]]]) -> List[List[str]]:
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode: {mode}")
+    depth = k * HYBRID_CANDIDATES if mode == "hybrid" else k
+    dense = load_dense() if mode != "bm25" else None
+    keyword = load_or_build_bm25_index(sources, chunk_size) if mode != "dense" else None
+    model = get_embedding_model(model_name) if dense else None
+    chunks = dense[1] if dense else keyword[1]
+
+    with span("rag.retrieve", k=k, mode=mode, queries=len(queries)):
+        rankings = []
+        if dense:
+            # One batched encode + search for all queries
+            _, indices = dense[0].search(model.encode(queries, convert_to_numpy=True), depth)
+            # Approximate indexes pad with -1 when fewer than k neighbours are found
+            rankings.append([[int(i) for i in row if i >= 0] for row in indices])
+        if keyword:
+            rankings.append([keyword[0].search(query, depth) for query in queries])
+        if mode == "hybrid":
+            ids = [reciprocal_rank_fusion(per_query, k) for per_query in zip(*rankings)]
+        else:
+            ids = rankings[0]
+    return [[chunks[i] for i in row] for row in ids]
+
+# --- Precomputed retrieval context ---
+# Top-k chunks for the built-in questions, computed offline by precompute_rag.py
+PRECOMPUTED_CHUNKS_PATH = os.environ.get("RAG_PRECOMPUTED_PATH", "rag_precomputed.json")
+_precomputed: Dict[str, object] = {"mtime": None, "table": {}}
+
+def precompute_question_chunks(sources: List[str], questions: List[str], k: int = 3, chunk_size: int = 500, model_name: str = "all-MiniLM-L6-v2", index_type: str = "auto", mode: str = "dense") -> dict:
+    unique_questions = list(dict.fromkeys(questions))
+    results = _retrieve(
+        sources, unique_questions, k, chunk_size, model_name, mode,
+        lambda: load_or_build_corpus_index(sources, chunk_size, model_name, index_type),
+    )
+    return {
+        "index_key": corpus_cache_key(sources, chunk_size, model_name, index_type),
+        "k": k,
+        "mode": mode,
+        "chunks": dict(zip(unique_questions, results)),
+    }
+
+def save_precomputed_chunks(entries: Dict[str, dict], path: str = PRECOMPUTED_CHUNKS_PATH):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "topics": entries}, f, ensure_ascii=False, indent=2)
+
+def _precomputed_table(path: str = PRECOMPUTED_CHUNKS_PATH) -> dict:
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except OSError:
+        return {}
+    if _precomputed["mtime"] != mtime:
+        with open(path, encoding="utf-8") as f:
+            _precomputed["table"] = json.load(f).get("topics", {})
+        _precomputed["mtime"] = mtime
+    return _precomputed["table"]
+
+def lookup_precomputed_chunks(topic: str, question: str, sources: List[str], k: int = 3, chunk_size: int = 500, model_name: str = "all-MiniLM-L6-v2", index_type: str = "auto", mode: str = "dense"):
+    entry = _precomputed_table().get(topic)
+    if not entry or entry.get("k") != k or entry.get("mode", "dense") != mode:
+        return None
+    # Ignore the table if the documents, chunk size or model changed since it was built
+    if entry.get("index_key") != corpus_cache_key(sources, chunk_size, model_name, index_type):
+        return None
+    return entry["chunks"].get(question)
 
 # RAG pipeline
-def rag_from_pdf(pdf_path: str, query: str, k: int = 3):
-    print("Extracting and chunking PDF...")
-    chunks = extract_pdf_chunks(pdf_path)
-    
-    print("Embedding chunks...")
-    model = SentenceTransformer("all-MiniLM-L6-v2")
-    embeddings, chunks = embed_chunks(chunks, model_name="all-MiniLM-L6-v2")
-    
-    print("Creating FAISS index...")
-    index = create_faiss_index(embeddings)
-    
+# mode: "dense", "bm25" or "hybrid" (see RETRIEVAL_MODES)
+def rag_from_pdf(pdf_path: str, query: str, k: int = 3, chunk_size: int = 500, model_name: str = "all-MiniLM-L6-v2", mode: str = "dense"):
+    load_dense = lambda: load_or_build_index(pdf_path, chunk_size, model_name)
+
     print("Retrieving relevant chunks...")
-    relevant_chunks = retrieve_relevant_chunks(query, index, chunks, model, k)
-    
+    relevant_chunks = _retrieve([pdf_path], [query], k, chunk_size, model_name, mode, load_dense)[0]
+
     return relevant_chunks
+
+def rag_from_corpus(sources: List[str], query: str, k: int = 3, chunk_size: int = 500, model_name: str = "all-MiniLM-L6-v2", index_type: str = "auto", mode: str = "dense"):
+    load_dense = lambda: load_or_build_corpus_index(sources, chunk_size, model_name, index_type)
+    return _retrieve(sources, [query], k, chunk_size, model_name, mode, load_dense)[0]
+
+# --- Backend agreement check ---
+def backend_topk_overlap(chunks: List[str], queries: List[str], k: int = 3, model_name: str = "all-MiniLM-L6-v2", reference: str = "torch", candidate: str = "onnx-int8") -> float:
+    # Mean fraction of the reference backend's top-k chunks that the candidate backend also returns
+    import numpy as np
+    top_k = {}
+    for backend in (reference, candidate):
+        model = get_embedding_model(model_name, backend)
+        chunk_embeddings = model.encode(chunks, convert_to_numpy=True).astype(EMBEDDING_STORAGE_DTYPE).astype(np.float32)
+        query_embeddings = model.encode(queries, convert_to_numpy=True)
+        # Squared L2 distance, as IndexFlatL2 ranks, without materializing every difference vector
+        distances = (chunk_embeddings ** 2).sum(axis=1)[None, :] - 2 * query_embeddings @ chunk_embeddings.T
+        top_k[backend] = np.argsort(distances, axis=1)[:, :k]
+    overlaps = [len(set(a) & set(b)) / k for a, b in zip(top_k[reference], top_k[candidate])]
+    return float(np.mean(overlaps)) if overlaps else 1.0
@@ -0,0 +1,67 @@
+import os
+import re
+from typing import List
+
+# Token caps for the variable parts of the evaluation prompt
+CONTEXT_TOKEN_BUDGET = int(os.environ.get("PROMPT_CONTEXT_TOKENS", 600))
+ANSWER_TOKEN_BUDGET = int(os.environ.get("PROMPT_ANSWER_TOKENS", 400))
+# A partly fitting chunk is only kept if at least this many of its tokens fit
+MIN_PARTIAL_CHUNK_TOKENS = 50
+
+_encoders = {}
+
+def _encoder(model: str):
+    if model not in _encoders:
+        try:
+            import tiktoken
+            try:
+                _encoders[model] = tiktoken.encoding_for_model(model)
+            except KeyError:
+                _encoders[model] = tiktoken.get_encoding("o200k_base")
+        except Exception as e:
+            # No tokenizer available (not installed, or its BPE file cannot be downloaded on an
+            # offline host): fall back to the ~4 characters per token estimate, and remember that
+            if not isinstance(e, ImportError):
+                print(f"tiktoken unavailable, estimating tokens from characters: {e}")
+            _encoders[model] = None
+    return _encoders[model]
+
+def count_tokens(text: str, model: str = "gpt-4o") -> int:
+    encoder = _encoder(model)
+    if encoder is None:
+        return (len(text) + 3) // 4
+    return len(encoder.encode(text))
+
+def trim_to_tokens(text: str, max_tokens: int, model: str = "gpt-4o") -> str:
+    encoder = _encoder(model)
+    if encoder is None:
+        return text if len(text) <= max_tokens * 4 else text[:max_tokens * 4].rstrip() + " …"
+    tokens = encoder.encode(text)
+    if len(tokens) <= max_tokens:
+        return text
+    return encoder.decode(tokens[:max_tokens]).rstrip() + " …"
+
+def _normalize(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip().lower()
+
+def budget_chunks(chunks: List[str], max_tokens: int = CONTEXT_TOKEN_BUDGET, model: str = "gpt-4o") -> List[str]:
+    # Drops duplicate chunks (and chunks contained in a higher-ranked one), then keeps chunks
+    # in rank order until the budget is spent, trimming the last one if enough of it fits
+    kept, seen = [], []
+    remaining = max_tokens
+    for chunk in chunks:
+        normalized = _normalize(chunk)
+        if not normalized or any(normalized in other for other in seen):
+            continue
+        seen.append(normalized)
+
+        tokens = count_tokens(chunk, model)
+        if tokens <= remaining:
+            kept.append(chunk.strip())
+            remaining -= tokens
+        elif remaining >= MIN_PARTIAL_CHUNK_TOKENS:
+            kept.append(trim_to_tokens(chunk.strip(), remaining, model))
+            remaining = 0
+        if remaining <= 0:
+            break
+    return kept
@@ -0,0 +1,219 @@
+# Offline batch grading: re-evaluate stored sessions or re-summarize topics, e.g. after a rubric change.
+#   $ python grade_batch.py evaluate --input sessions.jsonl --output graded.jsonl --concurrency 16
+#   $ python grade_batch.py summarize --sheet --output summaries.jsonl
+# The output file is also the checkpoint: rerun the same command to resume, finished ids are skipped
+# and failed ones are retried. Throughput is bounded by --concurrency and the shared client's rate limits.
+import argparse
+import csv
+import hashlib
+import json
+import os
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timezone
+from typing import Iterator, List, Tuple
+
+from functions import evaluate_all_responses, generate_manager_summary_hierarchical
+
+# --- Reading sessions ---
+def parse_chat_text(chat_text: str) -> List[Tuple[str, str]]:
+    # Inverse of the "Q: ... A: ..." lines the app saves; lines without a "Q: " prefix continue the previous answer
+    qa_pairs = []
+    for line in chat_text.splitlines():
+        if line.startswith("Q: "):
+            question, _, answer = line[3:].partition(" A: ")
+            qa_pairs.append([question, answer])
+        elif qa_pairs:
+            qa_pairs[-1][1] += "\n" + line
+    return [(q, a) for q, a in qa_pairs]
+
+def _qa_pairs(value) -> List[Tuple[str, str]]:
+    # CSV cells hold the pairs as a JSON string
+    if isinstance(value, str):
+        value = json.loads(value)
+    qa_pairs = []
+    for pair in value:
+        if isinstance(pair, str) or len(pair) != 2:
+            raise ValueError(f"expected [question, answer] pairs, got {pair!r}")
+        qa_pairs.append((str(pair[0]), str(pair[1])))
+    return qa_pairs
+
+def _session(record: dict) -> dict:
+    topic = record.get("topic", "")
+    error = None
+    try:
+        if record.get("qa_pairs"):
+            qa_pairs = _qa_pairs(record["qa_pairs"])
+            chat = "\n".join(f"Q: {q} A: {a}" for q, a in qa_pairs)
+        else:
+            chat = record.get("chat", "")
+            qa_pairs = parse_chat_text(chat)
+    except (ValueError, TypeError) as e:
+        # Reported as this item's error; the rest of the batch still runs
+        qa_pairs, chat = [], json.dumps(record, ensure_ascii=False, sort_keys=True, default=str)
+        error = f"Malformed record: {e}"
+    session_id = record.get("id") or hashlib.sha256(
+        f"{topic}|{record.get('timestamp', '')}|{chat}".encode("utf-8")
+    ).hexdigest()[:16]
+    session = {"id": str(session_id), "topic": topic, "chat": chat, "qa_pairs": qa_pairs}
+    if error:
+        session["error"] = error
+    return session
+
+def read_sessions(path: str = None, worksheet: str = None) -> Iterator[dict]:
+    # JSONL records or CSV rows with "topic" and either "chat" (sheet format) or "qa_pairs"; optional "id"
+    if worksheet:
+        from functions_gsheet import open_worksheet
+        records = open_worksheet(worksheet).get_all_records()
+    elif path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            records = list(csv.DictReader(f))
+    else:
+        with open(path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    for record in records:
+        if record.get("topic"):
+            yield _session(record)
+
+# --- Checkpoint ---
+def load_finished(output_path: str) -> set:
+    finished = set()
+    if not os.path.exists(output_path):
+        return finished
+    with open(output_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                result = json.loads(line)
+            except json.JSONDecodeError:
+                # A run killed mid-write can leave a partial last line
+                continue
+            if result.get("error"):
+                finished.discard(result["id"])
+            else:
+                finished.add(result["id"])
+    return finished
+
+def drop_partial_line(output_path: str):
+    # Cut a half-written last line off, so the next result starts on a line of its own
+    if not os.path.exists(output_path):
+        return
+    with open(output_path, "rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        pos = end
+        while pos > 0:
+            start = max(0, pos - 65536)
+            f.seek(start)
+            block = f.read(pos - start)
+            newline = block.rfind(b"\n")
+            if newline != -1:
+                pos = start + newline + 1
+                break
+            pos = start
+        if pos < end:
+            f.truncate(pos)
+
+# --- Tasks ---
+def evaluate_task(session: dict, model: str, use_cache: bool) -> str:
+    return evaluate_all_responses(session["qa_pairs"], session["topic"], model, use_cache=use_cache)
+
+def summarize_task(topic_group: dict, model: str, use_cache: bool) -> str:
+    # Shard notes stay cached on disk by content either way; use_cache applies to the summary call itself
+    return generate_manager_summary_hierarchical(topic_group["topic"], topic_group["chats"], model=model, use_cache=use_cache)
+
+def group_by_topic(sessions: Iterator[dict]) -> List[dict]:
+    groups = OrderedDict()
+    for session in sessions:
+        if session.get("error"):
+            print(f"Skipping session {session['id']}: {session['error']}")
+            continue
+        groups.setdefault(session["topic"], []).append(session["chat"])
+    return [{"id": topic, "topic": topic, "chats": chats} for topic, chats in groups.items()]
+
+def run_batch(task: str, items: Iterator[dict], output_path: str, concurrency: int, model: str, use_cache: bool) -> Tuple[int, int]:
+    fn = evaluate_task if task == "evaluate" else summarize_task
+    finished = load_finished(output_path)
+    drop_partial_line(output_path)
+    done = failed = 0
+    started = time.perf_counter()
+
+    def run(item: dict) -> dict:
+        start = time.perf_counter()
+        if item.get("error"):
+            text, error = "", item["error"]
+        else:
+            try:
+                text = fn(item, model, use_cache)
+                error = text if text.startswith("Error") else None
+            except Exception as e:
+                text, error = "", str(e)
+        result = {
+            "id": item["id"],
+            "topic": item["topic"],
+            "task": task,
+            "model": model,
+            "result": text,
+            "seconds": round(time.perf_counter() - start, 3),
+            "graded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        }
+        if error:
+            result["error"] = error
+        return result
+
+    # Results are written from this thread only, one line per item as soon as it finishes;
+    # at most 2 x concurrency items are in flight, so huge exports are never held as futures
+    with open(output_path, "a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=concurrency) as pool:
+        in_flight = set()
+
+        def drain(return_when):
+            nonlocal done, failed
+            completed, pending = wait(in_flight, return_when=return_when)
+            for future in completed:
+                result = future.result()
+                out.write(json.dumps(result, ensure_ascii=False) + "\n")
+                out.flush()
+                done += 1
+                failed += bool(result.get("error"))
+                if done % 50 == 0:
+                    print(f"{done} done ({failed} failed), {done / (time.perf_counter() - started):.1f}/s", flush=True)
+            return pending
+
+        for item in items:
+            if item["id"] in finished:
+                continue
+            in_flight.add(pool.submit(run, item))
+            if len(in_flight) >= 2 * concurrency:
+                in_flight = drain(FIRST_COMPLETED)
+        while in_flight:
+            in_flight = drain(FIRST_COMPLETED)
+    return done, failed
+
+def main():
+    parser = argparse.ArgumentParser(description="Grade or summarize stored sessions in bulk.")
+    parser.add_argument("task", choices=["evaluate", "summarize"], help="final evaluation per session, or manager summary per topic")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--input", help="JSONL or CSV export of sessions")
+    source.add_argument("--sheet", nargs="?", const="Sheet1", metavar="WORKSHEET", help="read sessions from the Google Sheet")
+    parser.add_argument("--output", required=True, help="JSONL results file, also used to resume")
+    parser.add_argument("--topic", action="append", help="only these topics (repeatable)")
+    parser.add_argument("--concurrency", type=int, default=8, help="OpenAI calls in flight (sets the shared client's limit)")
+    parser.add_argument("--model", default="gpt-4o")
+    parser.add_argument("--no-cache", action="store_true", help="do not reuse cached LLM responses")
+    args = parser.parse_args()
+
+    sessions = read_sessions(args.input, args.sheet)
+    if args.topic:
+        sessions = (s for s in sessions if s["topic"] in args.topic)
+    items = group_by_topic(sessions) if args.task == "summarize" else sessions
+
+    # The shared client caps OpenAI calls in flight; size it to match before its first use
+    os.environ["OPENAI_MAX_CONCURRENCY"] = str(args.concurrency)
+
+    started = time.perf_counter()
+    done, failed = run_batch(args.task, items, args.output, args.concurrency, args.model, not args.no_cache)
+    print(f"Finished {done} items in {time.perf_counter() - started:.1f}s ({failed} failed) -> {args.output}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
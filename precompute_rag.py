@@ -0,0 +1,26 @@
+# Offline step: compute the top-k RAG chunks for every built-in question.
+# Run after changing a topic PDF or the question bank:
+#   $ python precompute_rag.py
+from functions import TOPIC_CORPORA, TOPIC_INDEX_TYPES, get_questions_for_topic, topic_retrieval_mode
+from functions_rag import PRECOMPUTED_CHUNKS_PATH, list_corpus_pdfs, precompute_question_chunks, save_precomputed_chunks
+
+KNOWLEDGE_TYPES = ["My knowledge on the topic", "My department’s maturity on the topic"]
+
+def main():
+    entries = {}
+    for topic, sources in TOPIC_CORPORA.items():
+        if not list_corpus_pdfs(sources):
+            print(f"Skipping {topic}: no PDFs found")
+            continue
+        questions = []
+        for knowledge_type in KNOWLEDGE_TYPES:
+            questions.extend(get_questions_for_topic(topic, knowledge_type))
+        print(f"Precomputing {len(questions)} questions for {topic}...")
+        entries[topic] = precompute_question_chunks(
+            sources, questions, k=3, index_type=TOPIC_INDEX_TYPES.get(topic, "auto"), mode=topic_retrieval_mode(topic)
+        )
+    save_precomputed_chunks(entries, PRECOMPUTED_CHUNKS_PATH)
+    print(f"Saved {PRECOMPUTED_CHUNKS_PATH}")
+
+if __name__ == "__main__":
+    main()
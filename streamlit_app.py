@@ -3,11 +3,19 @@ from functions import (
     get_questions_for_topic,
     evaluate_user_response,
     evaluate_all_responses,
+    evaluate_session,
+    assess_question,
+    INCREMENTAL_EVALUATION,
     save_chat_to_gsheet,
-    generate_manager_summary,
+    generate_manager_summary_hierarchical,
+    warm_up_rag_topics,
 )
 import random
-from streamlit_gsheets import GSheetsConnection
+import pandas as pd
+from functions_cache import get_llm_cache
+from functions_gsheet import get_sheet_mirror
+from functions_jobs import cancel_job, get_job, pop_job, submit_job
+from functions_metrics import stage_stats
 
 # --- Page Config ---
 st.set_page_config(page_title="Nubo Knowledge Checker", page_icon="🧠")
@@ -25,6 +33,9 @@ st.session_state.setdefault("final_summary_displayed", False)
 st.session_state.setdefault("waiting_for_input", True)
 st.session_state.setdefault("manager_summary", "")
 st.session_state.setdefault("new_evaluation_available", False)
+st.session_state.setdefault("pending_job", None)
+st.session_state.setdefault("assessment_jobs", [])
+st.session_state.setdefault("manager_summary_topic", "")
 
 transition_messages = [
     "Thanks for your reply. I was also wondering...",
@@ -40,11 +51,53 @@ transition_messages = [
     "Appreciate that! Let’s explore this further...",
 ]
 
+# --- Background LLM jobs ---
+def cancel_pending_job():
+    if st.session_state.pending_job:
+        cancel_job(st.session_state.pending_job["id"])
+        st.session_state.pending_job = None
+    for job_id in st.session_state.assessment_jobs:
+        cancel_job(job_id)
+    st.session_state.assessment_jobs = []
+
+def finish_pending_job(kind: str, text: str):
+    if kind == "manager":
+        st.session_state.manager_summary = text
+        return
+
+    st.session_state.messages.append({"role": "assistant", "content": text})
+    if kind == "final":
+        st.session_state.final_summary_displayed = True
+    else:
+        st.session_state.waiting_for_input = True
+
+# Polls the running job: shows the text generated so far, then reruns the app once it is done
+@st.fragment(run_every=0.5)
+def show_pending_job():
+    pending = st.session_state.pending_job
+    job = get_job(pending["id"]) if pending else None
+    if job is None:
+        return
+
+    with st.container() if pending["kind"] == "manager" else st.chat_message("assistant"):
+        if job.text:
+            st.markdown(job.text + " ▌")
+        else:
+            st.markdown("_Nubo is thinking..._")
+
+    if job.done():
+        pop_job(pending["id"])
+        st.session_state.pending_job = None
+        text = job.text.strip() if not job.error else f"Error evaluating response: {job.error}"
+        finish_pending_job(pending["kind"], text)
+        st.rerun()
+
 # --- Sidebar Navigation ---
 with st.sidebar:
     st.markdown("## 🔍 Navigation")
 
     if st.button("👤 User"):
+        cancel_pending_job()
         st.session_state.page = "User"
         st.session_state.chat_started = False
         st.session_state.messages = []
@@ -61,9 +114,14 @@ with st.sidebar:
             unsafe_allow_html=True
         )
     if st.button("📊 Manager"):
+        cancel_pending_job()
         st.session_state.page = "Manager"
         st.session_state.new_evaluation_available = False
 
+    # Hidden admin page, shown with ?admin=1 in the URL
+    if st.query_params.get("admin") == "1" and st.button("⏱️ Performance"):
+        st.session_state.page = "Admin"
+
 # --- Page Header ---
 st.title("🧠 Nubo Knowledge Checker")
 st.write("Test your understanding and get instant feedback from Nubo.")
@@ -91,6 +149,7 @@ if st.session_state.page == "User":
         final_topic = selected_topic
 
     if st.button("▶️ Start"):
+        cancel_pending_job()
         st.session_state.chat_started = True
         st.session_state.messages = []
         st.session_state.question_index = 0
@@ -125,22 +184,34 @@ if st.session_state.page == "User":
                 current_q = st.session_state.questions[st.session_state.question_index]
                 st.session_state.attempt_count += 1
 
-                response = evaluate_user_response(
-                    question=current_q,
-                    answer=prompt,
-                    topic=st.session_state.final_topic,
-                    attempts=st.session_state.attempt_count
-                )
-
                 if st.session_state.attempt_count == 1:
-                    # First response → save and ask follow-up
+                    # First response → save and ask follow-up, generated in the background job queue
                     st.session_state.qa_pairs.append((current_q, prompt))
-                    st.session_state.messages.append({"role": "assistant", "content": response})
-                    with st.chat_message("assistant"):
-                        st.markdown(response)
-                    st.session_state.waiting_for_input = True
+                    st.session_state.pending_job = {
+                        "id": submit_job(
+                            evaluate_user_response,
+                            question=current_q,
+                            answer=prompt,
+                            topic=st.session_state.final_topic,
+                            attempts=st.session_state.attempt_count,
+                            stream=True
+                        ),
+                        "kind": "followup",
+                    }
 
                 else:
+                    if INCREMENTAL_EVALUATION:
+                        # Assess this question in the background; the final evaluation only merges these notes
+                        followup = next(m["content"] for m in reversed(st.session_state.messages) if m["role"] == "assistant")
+                        st.session_state.assessment_jobs.append(submit_job(
+                            assess_question,
+                            question=current_q,
+                            answer=st.session_state.qa_pairs[-1][1],
+                            followup=followup,
+                            followup_answer=prompt,
+                            topic=st.session_state.final_topic
+                        ))
+
                     # Second response → save follow-up, move to next
                     st.session_state.qa_pairs.append((f"Follow-up on: {current_q}", prompt))
                     st.session_state.question_index += 1
@@ -161,46 +232,97 @@ if st.session_state.page == "User":
                     else:
                         # All questions done → generate summary
                         if not st.session_state.final_summary_displayed:
-                            with st.spinner("Generating your overall evaluation..."):
-                                summary = evaluate_all_responses(
+                            st.session_state.waiting_for_input = False
+
+                            # Save only current session's chat, now: the row must not depend on the tab
+                            # staying open until the summary arrives
+                            chat_history = "\n".join(
+                                f"Q: {q} A: {a}" for q, a in st.session_state.qa_pairs
+                            )
+                            save_chat_to_gsheet(
+                                topic=st.session_state.final_topic,
+                                chat_text=chat_history
+                            )
+                            st.session_state.new_evaluation_available = True
+
+                            if INCREMENTAL_EVALUATION:
+                                final_job = submit_job(
+                                    evaluate_session,
                                     st.session_state.qa_pairs,
-                                    st.session_state.final_topic
+                                    st.session_state.final_topic,
+                                    st.session_state.assessment_jobs,
+                                    stream=True
                                 )
-                                st.session_state.messages.append({"role": "assistant", "content": summary})
-                                st.session_state.final_summary_displayed = True
-
-                                # Save only current session's chat
-                                chat_history = "\n".join(
-                                    f"Q: {q} A: {a}" for q, a in st.session_state.qa_pairs
-                                )
-                                save_chat_to_gsheet(
-                                    topic=st.session_state.final_topic,
-                                    chat_text=chat_history
+                                st.session_state.assessment_jobs = []
+                            else:
+                                final_job = submit_job(
+                                    evaluate_all_responses,
+                                    st.session_state.qa_pairs,
+                                    st.session_state.final_topic,
+                                    stream=True
                                 )
+                            st.session_state.pending_job = {"id": final_job, "kind": "final"}
 
-                                st.session_state.new_evaluation_available = True
-
-                                with st.chat_message("assistant"):
-                                    st.markdown(summary)
+        if st.session_state.pending_job and st.session_state.pending_job["kind"] != "manager":
+            show_pending_job()
 
 # --- MANAGER TAB ---
 elif st.session_state.page == "Manager":
     st.subheader("📊 Manager Dashboard")
 
-    conn = st.connection("gsheets", type=GSheetsConnection)
-    df = conn.read(worksheet="Sheet1", ttl=0)
-
-    if df is None or df.empty:
+    # Read from the local mirror; it only goes back to the sheet when older than its staleness bound
+    mirror = get_sheet_mirror()
+    try:
+        if st.button("🔄 Sync with sheet"):
+            mirror.sync()
+        else:
+            mirror.ensure_fresh()
+    except Exception as e:
+        st.warning(f"Could not sync with Google Sheets, showing cached data: {e}")
+
+    topics = mirror.topics()
+    if not topics:
         st.info("No evaluation data available yet.")
     else:
-        topics = df["topic"].unique().tolist()
         selected_topic = st.selectbox("Select a topic:", topics)
 
         if st.button("Run Evaluation Summary"):
-            topic_chats = df[df["topic"] == selected_topic]["chat"].tolist()
-            combined_text = "\n\n".join(topic_chats)
+            topic_chats = mirror.topic_chats(selected_topic)
+
+            cancel_pending_job()
+            st.session_state.manager_summary = ""
+            st.session_state.pending_job = {
+                "id": submit_job(generate_manager_summary_hierarchical, selected_topic, topic_chats),
+                "kind": "manager",
+            }
+            st.session_state.manager_summary_topic = selected_topic
+
+        pending = st.session_state.pending_job
+        manager_pending = pending is not None and pending["kind"] == "manager"
+        if manager_pending or st.session_state.manager_summary:
+            st.markdown(f"### 📋 Team Summary for {st.session_state.manager_summary_topic}")
+        if manager_pending:
+            show_pending_job()
+        elif st.session_state.manager_summary:
+            st.markdown(st.session_state.manager_summary)
+
+# --- ADMIN TAB ---
+elif st.session_state.page == "Admin":
+    st.subheader("⏱️ Performance")
+    st.caption("Rolling timings per stage for this server process (most recent spans per stage).")
+
+    stats = stage_stats()
+    if not stats:
+        st.info("No timings recorded yet.")
+    else:
+        st.dataframe(pd.DataFrame.from_dict(stats, orient="index").round(1), use_container_width=True)
 
-            summary = generate_manager_summary(selected_topic, combined_text)
+    cache_stats = get_llm_cache().stats()
+    st.markdown(
+        f"**LLM cache:** {cache_stats['hits']} hits, {cache_stats['misses']} misses "
+        f"({cache_stats['hit_rate']:.0%} hit rate)"
+    )
+    st.button("🔄 Refresh")
 
-            st.markdown(f"### 📋 Team Summary for {selected_topic}")
-            st.markdown(summary)
+# --- After the page has rendered, load the embedding model and topic indexes in the background (once per process) ---
+warm_up_rag_topics()